@@ -0,0 +1,28 @@
+import orjson
+from typing import Any
+from fastapi.responses import Response
+
+# now_utc() and timestamptz columns are aware UTC; stray naive values are treated as UTC too.
+# Always emit UTC with a "Z" suffix
+_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize to JSON bytes; datetimes/UUIDs are formatted natively by orjson"""
+    return orjson.dumps(obj, option=_OPTIONS)
+
+
+class ORJSONResponse(Response):
+    """JSON response rendered with dumps() (orjson), the app's default response class"""
+    
+    media_type = "application/json"
+    
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# Export commonly used items
+__all__ = [
+    "dumps",
+    "ORJSONResponse",
+]
@@ -1,7 +1,9 @@
 from pydantic_settings import BaseSettings
-from pydantic import Field, validator
-from typing import List, Optional
+from pydantic import Field, field_validator
+from typing import List, Literal, Optional
+from functools import cached_property, lru_cache
 import secrets
+import sys
 
 
 class Settings(BaseSettings):
@@ -10,7 +12,7 @@ class Settings(BaseSettings):
     # Application settings
     APP_NAME: str = "Language Exchange Platform"
     VERSION: str = "1.0.0"
-    ENVIRONMENT: str = Field(default="development", description="Environment: development, staging, production")
+    ENVIRONMENT: Literal["development", "staging", "production"] = Field(default="development", description="Environment: development, staging, production")
     DEBUG: bool = Field(default=False, description="Debug mode")
     
     # Server settings
@@ -41,6 +43,7 @@ class Settings(BaseSettings):
     DATABASE_ECHO: bool = Field(default=False, description="Echo SQL queries")
     DATABASE_POOL_SIZE: int = Field(default=10, description="Database connection pool size")
     DATABASE_MAX_OVERFLOW: int = Field(default=20, description="Database max overflow connections")
+    DATABASE_POOL_RECYCLE: int = Field(default=300, description="Recycle pooled connections after this many seconds")
     
     # Redis settings
     REDIS_URL: str = Field(
@@ -48,6 +51,7 @@ class Settings(BaseSettings):
         description="Redis connection URL"
     )
     REDIS_EXPIRE_TIME: int = Field(default=3600, description="Default Redis expiration time in seconds")
+    REDIS_MAX_CONNECTIONS: int = Field(default=100, description="Redis connection pool size")
     
     # Celery settings
     CELERY_BROKER_URL: str = Field(
@@ -62,6 +66,8 @@ class Settings(BaseSettings):
     # Rate limiting settings
     RATE_LIMIT_REQUESTS_PER_MINUTE: int = Field(default=60, description="Rate limit per minute")
     RATE_LIMIT_BURST: int = Field(default=10, description="Rate limit burst capacity")
+    RATE_LIMIT_LOCAL_CACHE_SIZE: int = Field(default=10_000, description="Max token buckets cached per process")
+    RATE_LIMIT_LOCAL_SYNC_MS: int = Field(default=100, description="Max milliseconds a local bucket is used before re-syncing with Redis")
     
     # WebSocket settings
     WS_HEARTBEAT_INTERVAL: int = Field(default=30, description="WebSocket heartbeat interval in seconds")
@@ -78,6 +84,9 @@ class Settings(BaseSettings):
     SESSION_MAX_DURATION_HOURS: int = Field(default=2, description="Maximum session duration in hours")
     SESSION_TURN_SWITCH_MINUTES: int = Field(default=10, description="Minutes before suggesting language turn switch")
     SESSION_IDLE_TIMEOUT_MINUTES: int = Field(default=15, description="Session idle timeout in minutes")
+    SESSION_HOT_STATE_FLUSH_SECONDS: float = Field(default=5.0, description="Interval for flushing Redis-buffered session state to Postgres")
+    SESSION_HOT_STATE_FLUSH_BATCH: int = Field(default=500, description="Max sessions written per hot-state flush statement")
+    SESSION_DAILY_STATS_REFRESH_SECONDS: float = Field(default=300.0, description="Interval for refreshing the daily session stats materialized view")
     
     # Vocabulary & SRS settings
     SRS_DAILY_REVIEW_LIMIT: int = Field(default=50, description="Daily SRS review limit")
@@ -123,33 +132,22 @@ class Settings(BaseSettings):
         description="Log format"
     )
     
-    @validator("ENVIRONMENT")
-    def validate_environment(cls, v):
-        if v not in ["development", "staging", "production"]:
-            raise ValueError("ENVIRONMENT must be one of: development, staging, production")
-        return v
-    
-    @validator("CORS_ORIGINS", pre=True)
-    def assemble_cors_origins(cls, v):
-        if isinstance(v, str):
-            return [i.strip() for i in v.split(",")]
-        return v
-    
-    @validator("ALLOWED_HOSTS", pre=True)
-    def assemble_allowed_hosts(cls, v):
+    @field_validator("CORS_ORIGINS", "ALLOWED_HOSTS", mode="before")
+    @classmethod
+    def split_comma_separated(cls, v):
         if isinstance(v, str):
-            return [i.strip() for i in v.split(",")]
+            return list(map(str.strip, v.split(",")))
         return v
     
-    @property
+    @cached_property
     def is_development(self) -> bool:
         return self.ENVIRONMENT == "development"
     
-    @property
+    @cached_property
     def is_production(self) -> bool:
         return self.ENVIRONMENT == "production"
     
-    @property
+    @cached_property
     def database_url_async(self) -> str:
         """Convert sync database URL to async for SQLAlchemy"""
         if self.DATABASE_URL.startswith("postgresql://"):
@@ -162,33 +160,49 @@ class Settings(BaseSettings):
         case_sensitive = True
 
 
-# Create settings instance
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Get the cached settings instance (parses environment and .env once)"""
+    return Settings()
 
-# Logging configuration
-import sys
-from loguru import logger
 
-# Remove default logger
-logger.remove()
+# Create settings instance
+settings = get_settings()
 
-# Add custom logger with format from settings
-logger.add(
-    sys.stdout,
-    level=settings.LOG_LEVEL,
-    format=settings.LOG_FORMAT,
-    colorize=True,
-    backtrace=True,
-    diagnose=True
-)
 
-# Add file logger for production
-if settings.is_production:
+def configure_logging() -> None:
+    """Configure loguru sinks; call once at application startup"""
+    from loguru import logger
+    
+    # Remove default logger
+    logger.remove()
+    
+    # Add custom logger with format from settings
     logger.add(
-        "logs/app.log",
-        rotation="500 MB",
-        retention="10 days",
-        level="INFO",
-        format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {name}:{function}:{line} - {message}",
-        compression="zip"
-    )
\ No newline at end of file
+        sys.stdout,
+        level=settings.LOG_LEVEL,
+        format=settings.LOG_FORMAT,
+        colorize=True,
+        backtrace=True,
+        diagnose=True
+    )
+    
+    # Add file logger for production
+    if settings.is_production:
+        logger.add(
+            "logs/app.log",
+            rotation="500 MB",
+            retention="10 days",
+            level="INFO",
+            format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {name}:{function}:{line} - {message}",
+            compression="zip"
+        )
+
+
+# Export commonly used items
+__all__ = [
+    "Settings",
+    "settings",
+    "get_settings",
+    "configure_logging",
+]
@@ -1,158 +1,337 @@
 from fastapi import Request, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.types import ASGIApp
-import redis
+import redis.asyncio as aioredis
+import asyncio
 import json
 import time
-from typing import Dict, Optional, Tuple
+from types import MappingProxyType
+from cachetools import TTLCache
+from typing import Dict, Final, Mapping, Optional, Tuple
 from loguru import logger
 
 from app.config import settings
+from app.core.redis_client import get_redis
 
 
 class TokenBucket:
     """Token bucket algorithm implementation for rate limiting"""
     
+    __slots__ = ("capacity", "tokens", "refill_rate", "refill_period", "refill_period_ns", "last_refill_ns")
+    
     def __init__(self, capacity: int, refill_rate: int, refill_period: int = 60):
         self.capacity = capacity
         self.tokens = capacity
         self.refill_rate = refill_rate  # tokens per refill_period
         self.refill_period = refill_period  # seconds
-        self.last_refill = time.time()
+        # Integer nanoseconds on the monotonic clock: immune to NTP jumps, no float rounding
+        self.refill_period_ns = refill_period * 1_000_000_000
+        self.last_refill_ns = time.monotonic_ns()
+    
+    @classmethod
+    def from_redis(cls, capacity: int, refill_rate: int, refill_period: int,
+                   tokens: int, last_refill_ms: int) -> "TokenBucket":
+        """Build a bucket from Redis state, whose timestamps are wall-clock milliseconds"""
+        bucket = cls(capacity, refill_rate, refill_period)
+        bucket.tokens = tokens
+        age_ns = time.time_ns() - last_refill_ms * 1_000_000
+        bucket.last_refill_ns -= age_ns
+        return bucket
+    
+    @property
+    def reset_time(self) -> float:
+        """Wall-clock time (epoch seconds) of the next refill"""
+        remaining_ns = self.last_refill_ns + self.refill_period_ns - time.monotonic_ns()
+        return time.time() + remaining_ns / 1_000_000_000
+    
+    def refill(self, now_ns: Optional[int] = None):
+        """Refill tokens based on elapsed time"""
+        now_ns = time.monotonic_ns() if now_ns is None else now_ns
+        elapsed_ns = now_ns - self.last_refill_ns
+        if elapsed_ns >= self.refill_period_ns:
+            periods = elapsed_ns // self.refill_period_ns
+            self.tokens = min(self.capacity, self.tokens + (self.refill_rate * periods))
+            self.last_refill_ns = now_ns
     
     def consume(self, tokens: int = 1) -> bool:
         """Try to consume tokens from bucket"""
-        now = time.time()
-        
-        # Refill tokens based on elapsed time
-        elapsed = now - self.last_refill
-        if elapsed >= self.refill_period:
-            periods = int(elapsed // self.refill_period)
-            self.tokens = min(self.capacity, self.tokens + (self.refill_rate * periods))
-            self.last_refill = now
+        self.refill()
         
         # Try to consume tokens
         if self.tokens >= tokens:
             self.tokens -= tokens
             return True
         return False
+
+
+class LocalBucket:
+    """Per-process copy of a Redis bucket plus tokens not yet written back"""
     
-    def to_dict(self) -> dict:
-        """Serialize bucket state"""
-        return {
-            "capacity": self.capacity,
-            "tokens": self.tokens,
-            "refill_rate": self.refill_rate,
-            "refill_period": self.refill_period,
-            "last_refill": self.last_refill
-        }
+    __slots__ = ("bucket", "synced_at_ns", "unsynced")
     
-    @classmethod
-    def from_dict(cls, data: dict) -> "TokenBucket":
-        """Deserialize bucket state"""
-        bucket = cls(data["capacity"], data["refill_rate"], data["refill_period"])
-        bucket.tokens = data["tokens"]
-        bucket.last_refill = data["last_refill"]
-        return bucket
+    def __init__(self, bucket: TokenBucket, synced_at_ns: int):
+        self.bucket = bucket
+        self.synced_at_ns = synced_at_ns  # monotonic
+        self.unsynced = 0  # tokens consumed locally since the last Redis sync
+
+
+class LocalBucketCache(TTLCache):
+    """TTLCache of LocalBuckets that keeps the unsynced tokens of entries it drops
+    
+    Entries removed by expiry or LRU eviction leave their unsynced count in
+    orphaned (key -> (bucket, tokens)) until RedisRateLimiter writes it back.
+    """
+    
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize, ttl)
+        self.orphaned: Dict[str, Tuple[TokenBucket, int]] = {}
+    
+    def _keep_unsynced(self, key: str, local: LocalBucket):
+        if local.unsynced:
+            _, pending = self.orphaned.get(key, (None, 0))
+            self.orphaned[key] = (local.bucket, pending + local.unsynced)
+            local.unsynced = 0
+    
+    def expire(self, time=None):
+        expired = super().expire(time)
+        for key, local in expired:
+            self._keep_unsynced(key, local)
+        return expired
+    
+    def popitem(self):
+        key, local = super().popitem()
+        self._keep_unsynced(key, local)
+        return key, local
+
+
+# Atomic token bucket: refill, consume and persist in a single round-trip.
+# State lives in a hash with integer fields "tokens" and "ts" (last refill, ms).
+# Mirrors TokenBucket.consume so both implementations agree on refill semantics.
+# ARGV[6] carries tokens already consumed from a local bucket; they are always
+# deducted (never below zero) before the current request is decided.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local period = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local requested = tonumber(ARGV[5])
+local unsynced = tonumber(ARGV[6])
+local period_ms = period * 1000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+elseif now - ts >= period_ms then
+    local periods = math.floor((now - ts) / period_ms)
+    tokens = math.min(capacity, tokens + refill_rate * periods)
+    ts = now
+end
+
+tokens = math.max(0, tokens - unsynced)
+
+local allowed = 0
+if tokens >= requested then
+    tokens = tokens - requested
+    allowed = 1
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', ts)
+redis.call('EXPIRE', KEYS[1], period * 2)
+return {allowed, tokens, ts}
+"""
+
+
+# Read-only so shared limiters can never be mutated at runtime
+_DEFAULT_LIMITS: Final[Mapping[str, Mapping[str, int]]] = MappingProxyType({
+    # General API limits
+    "default": MappingProxyType({"capacity": 60, "refill_rate": 60, "period": 60}),  # 60 req/min
+    "auth": MappingProxyType({"capacity": 10, "refill_rate": 10, "period": 60}),     # 10 auth req/min
+    "match": MappingProxyType({"capacity": 20, "refill_rate": 20, "period": 60}),    # 20 match req/min
+    
+    # WebSocket limits
+    "ws_connect": MappingProxyType({"capacity": 5, "refill_rate": 5, "period": 60}), # 5 connections/min
+    "ws_message": MappingProxyType({"capacity": 120, "refill_rate": 120, "period": 60}), # 2 msg/sec
+    
+    # User content limits
+    "vocab_save": MappingProxyType({"capacity": 30, "refill_rate": 30, "period": 60}), # 30 saves/min
+    "feedback": MappingProxyType({"capacity": 10, "refill_rate": 10, "period": 300}),   # 10 feedback/5min
+    "report": MappingProxyType({"capacity": 5, "refill_rate": 5, "period": 3600}),      # 5 reports/hour
+    
+    # Heavy operations
+    "session_create": MappingProxyType({"capacity": 10, "refill_rate": 10, "period": 300}), # 10 sessions/5min
+    "translation": MappingProxyType({"capacity": 100, "refill_rate": 100, "period": 3600}), # 100 translations/hour
+})
 
 
 class RedisRateLimiter:
     """Redis-based distributed rate limiter"""
     
-    def __init__(self, redis_client: redis.Redis):
+    def __init__(self, redis_client: aioredis.Redis):
         self.redis = redis_client
-        self.default_limits = {
-            # General API limits
-            "default": {"capacity": 60, "refill_rate": 60, "period": 60},  # 60 req/min
-            "auth": {"capacity": 10, "refill_rate": 10, "period": 60},     # 10 auth req/min
-            "match": {"capacity": 20, "refill_rate": 20, "period": 60},    # 20 match req/min
-            
-            # WebSocket limits
-            "ws_connect": {"capacity": 5, "refill_rate": 5, "period": 60}, # 5 connections/min
-            "ws_message": {"capacity": 120, "refill_rate": 120, "period": 60}, # 2 msg/sec
-            
-            # User content limits
-            "vocab_save": {"capacity": 30, "refill_rate": 30, "period": 60}, # 30 saves/min
-            "feedback": {"capacity": 10, "refill_rate": 10, "period": 300},   # 10 feedback/5min
-            "report": {"capacity": 5, "refill_rate": 5, "period": 3600},      # 5 reports/hour
-            
-            # Heavy operations
-            "session_create": {"capacity": 10, "refill_rate": 10, "period": 300}, # 10 sessions/5min
-            "translation": {"capacity": 100, "refill_rate": 100, "period": 3600}, # 100 translations/hour
-        }
+        
+        # Registered once; redis-py runs it via EVALSHA and reloads it on NOSCRIPT
+        self._consume_script = self.redis.register_script(TOKEN_BUCKET_SCRIPT)
+        
+        # Hot identifiers are served from process memory between Redis syncs;
+        # limits across workers become approximate by at most one sync interval.
+        # Tokens of expired/evicted entries are written back on the next sync.
+        self._local = LocalBucketCache(
+            maxsize=settings.RATE_LIMIT_LOCAL_CACHE_SIZE,
+            ttl=max(60, 2 * settings.RATE_LIMIT_LOCAL_SYNC_MS / 1000),
+        )
+        self._local_sync_interval_ns = settings.RATE_LIMIT_LOCAL_SYNC_MS * 1_000_000
+        self._write_back: Optional[asyncio.Task] = None
     
     def _get_bucket_key(self, identifier: str, limit_type: str) -> str:
         """Generate Redis key for rate limit bucket"""
-        return f"rate_limit:{limit_type}:{identifier}"
+        # v2: hash layout used by TOKEN_BUCKET_SCRIPT, kept apart from the old JSON string keys
+        return f"rate_limit:v2:{limit_type}:{identifier}"
+    
+    def _get_limits(self, limit_type: str) -> Mapping[str, int]:
+        """Get limits for a limit type, falling back to defaults"""
+        return _DEFAULT_LIMITS.get(limit_type, _DEFAULT_LIMITS["default"])
     
-    def _get_bucket(self, identifier: str, limit_type: str) -> TokenBucket:
-        """Get or create token bucket from Redis"""
+    async def is_allowed(self, identifier: str, limit_type: str = "default", tokens: int = 1) -> Tuple[bool, Dict]:
+        """Check if request is allowed and return status"""
         key = self._get_bucket_key(identifier, limit_type)
+        limits = self._get_limits(limit_type)
+        now_ns = time.monotonic_ns()
         
-        try:
-            bucket_data = self.redis.get(key)
-            if bucket_data:
-                data = json.loads(bucket_data)
-                return TokenBucket.from_dict(data)
-        except (json.JSONDecodeError, KeyError, TypeError) as e:
-            logger.warning(f"Invalid bucket data for {key}: {e}")
+        # Allow from the local bucket while it is fresh; denials always go to Redis
+        local = self._local.get(key)
+        if local is not None and now_ns - local.synced_at_ns < self._local_sync_interval_ns:
+            if local.bucket.consume(tokens):
+                local.unsynced += tokens
+                return True, self._status_info(limit_type, local.bucket, True)
+        
+        # Hand locally consumed tokens to this sync so they are not counted twice;
+        # expire() first so a just-expired entry for this key lands in orphaned
+        self._local.expire()
+        _, unsynced = self._local.orphaned.pop(key, (None, 0))
+        if local is not None:
+            unsynced += local.unsynced
+            local.unsynced = 0
         
-        # Create new bucket with default limits
-        limits = self.default_limits.get(limit_type, self.default_limits["default"])
-        return TokenBucket(
-            capacity=limits["capacity"],
-            refill_rate=limits["refill_rate"],
-            refill_period=limits["period"]
+        # Refill, consume and save bucket state atomically in Redis; Redis is shared
+        # across hosts, so its clock is wall-clock integer milliseconds
+        allowed, tokens_remaining, last_refill_ms = await self._consume_script(
+            keys=[key],
+            args=[limits["capacity"], limits["refill_rate"], limits["period"],
+                  time.time_ns() // 1_000_000, tokens, unsynced],
         )
-    
-    def _save_bucket(self, identifier: str, limit_type: str, bucket: TokenBucket):
-        """Save token bucket to Redis"""
-        key = self._get_bucket_key(identifier, limit_type)
-        bucket_data = json.dumps(bucket.to_dict())
         
-        # Set expiry to prevent memory leaks
-        expiry = bucket.refill_period * 2
-        self.redis.setex(key, expiry, bucket_data)
-    
-    def is_allowed(self, identifier: str, limit_type: str = "default", tokens: int = 1) -> Tuple[bool, Dict]:
-        """Check if request is allowed and return status"""
-        bucket = self._get_bucket(identifier, limit_type)
-        allowed = bucket.consume(tokens)
+        bucket = TokenBucket.from_redis(
+            limits["capacity"], limits["refill_rate"], limits["period"],
+            int(tokens_remaining), int(last_refill_ms)
+        )
+        self._local[key] = LocalBucket(bucket, synced_at_ns=now_ns)
         
-        # Save bucket state
-        self._save_bucket(identifier, limit_type, bucket)
+        # Write-back runs off the request path, one flush at a time
+        if self._local.orphaned and (self._write_back is None or self._write_back.done()):
+            self._write_back = asyncio.create_task(self.flush_orphaned())
         
-        # Return status info
-        status_info = {
+        return bool(allowed), self._status_info(limit_type, bucket, bool(allowed))
+    
+    async def flush_orphaned(self):
+        """Deduct tokens of dropped local entries in Redis (one pipelined round trip)
+        
+        Started as a background task by is_allowed. Uses TOKEN_BUCKET_SCRIPT with
+        nothing requested; on failure the counts are kept for the next attempt.
+        """
+        orphaned, self._local.orphaned = self._local.orphaned, {}
+        now_ms = time.time_ns() // 1_000_000
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, (bucket, unsynced) in orphaned.items():
+                    await self._consume_script(
+                        keys=[key],
+                        args=[bucket.capacity, bucket.refill_rate, bucket.refill_period, now_ms, 0, unsynced],
+                        client=pipe,
+                    )
+                await pipe.execute()
+        except Exception as e:
+            logger.error("Rate limiter write-back failed: {}", e)
+            for key, (bucket, unsynced) in orphaned.items():
+                _, pending = self._local.orphaned.get(key, (None, 0))
+                self._local.orphaned[key] = (bucket, pending + unsynced)
+    
+    def _status_info(self, limit_type: str, bucket: TokenBucket, allowed: bool) -> Dict:
+        """Build status info for a bucket"""
+        return {
             "allowed": allowed,
             "limit_type": limit_type,
             "tokens_remaining": bucket.tokens,
             "capacity": bucket.capacity,
-            "reset_time": bucket.last_refill + bucket.refill_period
+            "reset_time": bucket.reset_time
         }
-        
-        return allowed, status_info
     
-    def get_status(self, identifier: str, limit_type: str = "default") -> Dict:
+    async def get_status(self, identifier: str, limit_type: str = "default") -> Dict:
         """Get current rate limit status without consuming tokens"""
-        bucket = self._get_bucket(identifier, limit_type)
+        key = self._get_bucket_key(identifier, limit_type)
+        limits = self._get_limits(limit_type)
+        stored_tokens, stored_ts = await self.redis.hmget(key, "tokens", "ts")
+        if stored_tokens is not None and stored_ts is not None:
+            bucket = TokenBucket.from_redis(
+                limits["capacity"], limits["refill_rate"], limits["period"],
+                int(stored_tokens), int(stored_ts)
+            )
+            bucket.refill()
+        else:
+            bucket = TokenBucket(
+                capacity=limits["capacity"],
+                refill_rate=limits["refill_rate"],
+                refill_period=limits["period"]
+            )
         
         return {
             "limit_type": limit_type,
             "tokens_remaining": bucket.tokens,
             "capacity": bucket.capacity,
-            "reset_time": bucket.last_refill + bucket.refill_period
+            "reset_time": bucket.reset_time
         }
 
 
+# Shared limiter for the middleware and the manual helpers below
+rate_limiter = RedisRateLimiter(get_redis())
+
+
+def get_client_identifier(request: Request) -> str:
+    """Get client identifier for rate limiting"""
+    # Single pass over the raw ASGI headers (names are already lowercase bytes)
+    auth_header = forwarded_for = None
+    for name, value in request.scope["headers"]:
+        if name == b"authorization":
+            if auth_header is None:
+                auth_header = value
+        elif name == b"x-forwarded-for":
+            if forwarded_for is None:
+                forwarded_for = value
+    
+    # Try to get user ID from JWT token first
+    if auth_header and auth_header.startswith(b"Bearer "):
+        # This would normally decode JWT to get user_id
+        # For now, use the token itself as identifier
+        return f"user:{auth_header[7:27].decode('ascii', 'ignore')}"  # First 20 chars of token
+    
+    # Fallback to IP address
+    if forwarded_for:
+        return f"ip:{forwarded_for.split(b',', 1)[0].strip().decode('latin-1')}"
+    
+    client_host = getattr(request.client, 'host', 'unknown')
+    return f"ip:{client_host}"
+
+
 class RateLimiterMiddleware(BaseHTTPMiddleware):
     """FastAPI middleware for rate limiting"""
     
     def __init__(self, app: ASGIApp):
         super().__init__(app)
-        self.redis_client = redis.from_url(settings.REDIS_URL)
-        self.rate_limiter = RedisRateLimiter(self.redis_client)
+        self.rate_limiter = rate_limiter
         
         # Route-specific rate limit mapping
         self.route_limits = {
@@ -168,46 +347,53 @@ class RateLimiterMiddleware(BaseHTTPMiddleware):
             "/api/v1/translate": "translation",
         }
         
+        # Distinct prefix lengths, longest first, for longest-prefix lookup
+        self._prefix_lengths = sorted({len(prefix) for prefix in self.route_limits}, reverse=True)
+        
         # Exempt routes from rate limiting
-        self.exempt_routes = {
+        self.exempt_routes = frozenset({
             "/health",
             "/",
             "/docs",
             "/redoc",
             "/openapi.json"
+        })
+        
+        # 429 bodies per limit type; only retry_after and reset_time vary per response
+        self._429_templates = {
+            limit_type: self._build_429_template(limit_type)
+            for limit_type in {*self.route_limits.values(), "default"}
         }
     
-    def _get_client_identifier(self, request: Request) -> str:
-        """Get client identifier for rate limiting"""
-        # Try to get user ID from JWT token first
-        auth_header = request.headers.get("authorization")
-        if auth_header and auth_header.startswith("Bearer "):
-            try:
-                # This would normally decode JWT to get user_id
-                # For now, use the token itself as identifier
-                return f"user:{auth_header[7:][:20]}"  # First 20 chars of token
-            except Exception:
-                pass
-        
-        # Fallback to IP address
-        forwarded_for = request.headers.get("x-forwarded-for")
-        if forwarded_for:
-            return f"ip:{forwarded_for.split(',')[0].strip()}"
-        
-        client_host = getattr(request.client, 'host', 'unknown')
-        return f"ip:{client_host}"
+    def _build_429_template(self, limit_type: str) -> Tuple[bytes, bytes]:
+        """Pre-serialize the static parts of the rate-limit-exceeded body"""
+        capacity = self.rate_limiter._get_limits(limit_type)["capacity"]
+        head = json.dumps({
+            "error": "Rate limit exceeded",
+            "message": f"Too many requests for {limit_type}",
+        }, separators=(",", ":"))
+        middle = json.dumps({"type": limit_type, "capacity": capacity}, separators=(",", ":"))
+        return (
+            f'{head[:-1]},"retry_after":'.encode(),
+            f',"limit_info":{middle[:-1]},"reset_time":'.encode(),
+        )
+    
+    def _429_body(self, limit_type: str, retry_after: int, reset_time: float) -> bytes:
+        """Fill the dynamic fields into the pre-built 429 body"""
+        head, middle = self._429_templates.get(limit_type) or self._build_429_template(limit_type)
+        return b"%b%d%b%b}}" % (head, retry_after, middle, repr(reset_time).encode())
     
     def _get_limit_type(self, request: Request) -> str:
         """Determine rate limit type based on route"""
         path = request.url.path
+        path_length = len(path)
         
-        # Check exact matches first
-        if path in self.route_limits:
-            return self.route_limits[path]
-        
-        # Check prefix matches
-        for route_prefix, limit_type in self.route_limits.items():
-            if path.startswith(route_prefix):
+        # Longest matching prefix wins; one dict lookup per distinct prefix length
+        for length in self._prefix_lengths:
+            if length > path_length:
+                continue
+            limit_type = self.route_limits.get(path[:length])
+            if limit_type is not None:
                 return limit_type
         
         return "default"
@@ -219,39 +405,29 @@ class RateLimiterMiddleware(BaseHTTPMiddleware):
         if request.url.path in self.exempt_routes:
             return await call_next(request)
         
-        # Skip rate limiting in development if configured
-        if settings.is_development and not settings.DEBUG:
-            return await call_next(request)
-        
         try:
             # Get client identifier and limit type
-            identifier = self._get_client_identifier(request)
+            identifier = get_client_identifier(request)
             limit_type = self._get_limit_type(request)
             
             # Check rate limit
-            allowed, status_info = self.rate_limiter.is_allowed(identifier, limit_type)
+            allowed, status_info = await self.rate_limiter.is_allowed(identifier, limit_type)
             
             if not allowed:
-                logger.warning(f"Rate limit exceeded for {identifier} on {request.url.path}")
+                logger.warning("Rate limit exceeded for {} on {}", identifier, request.url.path)
                 
                 # Return rate limit error
-                return JSONResponse(
+                reset_time = status_info["reset_time"]
+                retry_after = int(reset_time - time.time())
+                return Response(
+                    content=self._429_body(limit_type, retry_after, reset_time),
                     status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    content={
-                        "error": "Rate limit exceeded",
-                        "message": f"Too many requests for {limit_type}",
-                        "retry_after": int(status_info["reset_time"] - time.time()),
-                        "limit_info": {
-                            "type": limit_type,
-                            "capacity": status_info["capacity"],
-                            "reset_time": status_info["reset_time"]
-                        }
-                    },
+                    media_type="application/json",
                     headers={
                         "X-RateLimit-Limit": str(status_info["capacity"]),
                         "X-RateLimit-Remaining": str(status_info["tokens_remaining"]),
-                        "X-RateLimit-Reset": str(int(status_info["reset_time"])),
-                        "Retry-After": str(int(status_info["reset_time"] - time.time()))
+                        "X-RateLimit-Reset": str(int(reset_time)),
+                        "Retry-After": str(retry_after)
                     }
                 )
             
@@ -264,9 +440,9 @@ class RateLimiterMiddleware(BaseHTTPMiddleware):
             response.headers["X-RateLimit-Reset"] = str(int(status_info["reset_time"]))
             
             return response
-            
+        
         except Exception as e:
-            logger.error(f"Rate limiter error: {e}")
+            logger.error("Rate limiter error: {}", e)
             # If rate limiter fails, allow the request to proceed
             return await call_next(request)
 
@@ -275,33 +451,21 @@ class RateLimiterMiddleware(BaseHTTPMiddleware):
 async def check_rate_limit(request: Request, limit_type: str = "default", tokens: int = 1) -> bool:
     """Manual rate limit check for specific endpoints"""
     try:
-        redis_client = redis.from_url(settings.REDIS_URL)
-        rate_limiter = RedisRateLimiter(redis_client)
-        
-        # Get client identifier
-        middleware = RateLimiterMiddleware(None)
-        identifier = middleware._get_client_identifier(request)
-        
-        allowed, _ = rate_limiter.is_allowed(identifier, limit_type, tokens)
+        identifier = get_client_identifier(request)
+        allowed, _ = await rate_limiter.is_allowed(identifier, limit_type, tokens)
         return allowed
-        
+    
     except Exception as e:
-        logger.error(f"Manual rate limit check error: {e}")
+        logger.error("Manual rate limit check error: {}", e)
         return True  # Allow on error
 
 
 async def get_rate_limit_status(request: Request, limit_type: str = "default") -> Dict:
     """Get current rate limit status for debugging"""
     try:
-        redis_client = redis.from_url(settings.REDIS_URL)
-        rate_limiter = RedisRateLimiter(redis_client)
-        
-        # Get client identifier
-        middleware = RateLimiterMiddleware(None)
-        identifier = middleware._get_client_identifier(request)
-        
-        return rate_limiter.get_status(identifier, limit_type)
-        
+        identifier = get_client_identifier(request)
+        return await rate_limiter.get_status(identifier, limit_type)
+    
     except Exception as e:
-        logger.error(f"Rate limit status error: {e}")
+        logger.error("Rate limit status error: {}", e)
         return {"error": str(e)}
\ No newline at end of file
@@ -0,0 +1,35 @@
+import redis.asyncio as aioredis
+from typing import Optional
+
+from app.config import settings
+
+# One async Redis pool per process, shared by the rate limiter and the session
+# state cache, and exposed as app.state.redis by the lifespan
+_redis: Optional[aioredis.Redis] = None
+
+
+def get_redis() -> aioredis.Redis:
+    """Get the shared async Redis client (created lazily; connects on first command)"""
+    global _redis
+    if _redis is None:
+        _redis = aioredis.Redis(connection_pool=aioredis.ConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS
+        ))
+    return _redis
+
+
+async def close_redis():
+    """Close the shared client and disconnect its pool (app shutdown)"""
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        await _redis.connection_pool.disconnect()
+        _redis = None
+
+
+# Export commonly used items
+__all__ = [
+    "get_redis",
+    "close_redis",
+]
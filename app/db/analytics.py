@@ -0,0 +1,168 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, MetaData, Table, DDL, event, select, text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+from datetime import datetime
+import uuid
+from typing import Dict, List, Optional
+from loguru import logger
+
+from app.db.base import Base
+from app.db.models.session import SessionEventTiming
+
+# Daily session rollups for dashboards, refreshed by run_daily_stats_refresh_loop().
+# Grouping keys are COALESCEd so the unique index that REFRESH ... CONCURRENTLY
+# requires can be built on plain columns.
+DAILY_STATS_VIEW = "mv_session_daily_stats"
+
+_create_daily_stats_view = DDL(f"""
+CREATE MATERIALIZED VIEW IF NOT EXISTS {DAILY_STATS_VIEW} AS
+SELECT
+    date_trunc('day', started_at) AS day,
+    COALESCE(languages->>'primary', '') AS primary_language,
+    COALESCE(end_reason::text, '') AS end_reason,
+    COUNT(*) AS session_count,
+    AVG(active_duration_seconds) AS avg_active_duration_seconds,
+    AVG(total_messages) AS avg_total_messages
+FROM sessions
+WHERE ended_at IS NOT NULL
+GROUP BY 1, 2, 3
+""")
+
+_create_daily_stats_index = DDL(f"""
+CREATE UNIQUE INDEX IF NOT EXISTS ix_{DAILY_STATS_VIEW}_key
+ON {DAILY_STATS_VIEW} (day, primary_language, end_reason)
+""")
+
+_drop_daily_stats_view = DDL(f"DROP MATERIALIZED VIEW IF EXISTS {DAILY_STATS_VIEW}")
+
+# Runs after create_all has built every table; Postgres only
+event.listen(Base.metadata, "after_create", _create_daily_stats_view.execute_if(dialect="postgresql"))
+event.listen(Base.metadata, "after_create", _create_daily_stats_index.execute_if(dialect="postgresql"))
+event.listen(Base.metadata, "before_drop", _drop_daily_stats_view.execute_if(dialect="postgresql"))
+
+# Query-side description of the view; kept off Base.metadata so create_all never builds it as a table
+session_daily_stats = Table(
+    DAILY_STATS_VIEW,
+    MetaData(),
+    Column("day", DateTime(timezone=True)),
+    Column("primary_language", String),
+    Column("end_reason", String),
+    Column("session_count", Integer),
+    Column("avg_active_duration_seconds", Float),
+    Column("avg_total_messages", Float),
+)
+
+
+async def get_daily_session_stats(db: AsyncSession, since: datetime,
+                                  primary_language: Optional[str] = None) -> List[Dict]:
+    """Read precomputed daily rollups of ended sessions from the materialized view"""
+    stmt = (
+        select(session_daily_stats)
+        .where(session_daily_stats.c.day >= since)
+        .order_by(session_daily_stats.c.day)
+    )
+    if primary_language is not None:
+        stmt = stmt.where(session_daily_stats.c.primary_language == primary_language)
+    
+    result = await db.execute(stmt)
+    return [dict(row) for row in result.mappings()]
+
+
+async def refresh_daily_session_stats(db: AsyncSession):
+    """Rebuild the rollups without blocking readers"""
+    await db.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {DAILY_STATS_VIEW}"))
+    await db.commit()
+
+
+async def run_daily_stats_refresh_loop(session_factory, interval_seconds: float):
+    """Periodically refresh the daily rollups until cancelled (started from the app lifespan)"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            async with session_factory() as db:
+                await refresh_daily_session_stats(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Daily session stats refresh failed: {}", e)
+
+
+
+# Session timings as a TimescaleDB hypertable, with hourly continuous aggregates per
+# session and kind. Only applied where the timescaledb extension is installed; plain
+# Postgres keeps a regular table and SessionEventTiming.stats.
+TIMINGS_HOURLY_VIEW = "cagg_session_event_timings_hourly"
+
+
+def _has_timescaledb(ddl, target, bind, **kw) -> bool:
+    return bind.exec_driver_sql(
+        "SELECT 1 FROM pg_extension WHERE extname = 'timescaledb'"
+    ).first() is not None
+
+
+_create_timings_hypertable = DDL(
+    "SELECT create_hypertable('session_event_timings', 'recorded_at', if_not_exists => TRUE)"
+)
+
+_create_timings_hourly_view = DDL(f"""
+CREATE MATERIALIZED VIEW IF NOT EXISTS {TIMINGS_HOURLY_VIEW}
+WITH (timescaledb.continuous) AS
+SELECT
+    time_bucket(INTERVAL '1 hour', recorded_at) AS bucket,
+    session_id,
+    kind,
+    COUNT(*) AS event_count,
+    AVG(seconds) AS avg_seconds,
+    MAX(seconds) AS max_seconds
+FROM session_event_timings
+GROUP BY bucket, session_id, kind
+WITH NO DATA
+""")
+
+_add_timings_hourly_policy = DDL(f"""
+SELECT add_continuous_aggregate_policy('{TIMINGS_HOURLY_VIEW}',
+    start_offset => INTERVAL '1 day',
+    end_offset => INTERVAL '1 hour',
+    schedule_interval => INTERVAL '30 minutes',
+    if_not_exists => TRUE)
+""")
+
+for _ddl in (_create_timings_hypertable, _create_timings_hourly_view, _add_timings_hourly_policy):
+    event.listen(SessionEventTiming.__table__, "after_create",
+                 _ddl.execute_if(dialect="postgresql", callable_=_has_timescaledb))
+
+session_event_timings_hourly = Table(
+    TIMINGS_HOURLY_VIEW,
+    MetaData(),
+    Column("bucket", DateTime(timezone=True)),
+    Column("session_id", UUID(as_uuid=True)),
+    Column("kind", String),
+    Column("event_count", Integer),
+    Column("avg_seconds", Float),
+    Column("max_seconds", Float),
+)
+
+
+async def get_session_timing_buckets(db: AsyncSession, session_id: uuid.UUID,
+                                     kind: str = SessionEventTiming.RESPONSE) -> List[Dict]:
+    """Hourly timing aggregates for a session from the continuous aggregate (TimescaleDB only)"""
+    view = session_event_timings_hourly
+    stmt = (
+        select(view.c.bucket, view.c.event_count, view.c.avg_seconds, view.c.max_seconds)
+        .where(view.c.session_id == session_id, view.c.kind == kind)
+        .order_by(view.c.bucket)
+    )
+    result = await db.execute(stmt)
+    return [dict(row) for row in result.mappings()]
+
+
+# Export commonly used items
+__all__ = [
+    "session_daily_stats",
+    "get_daily_session_stats",
+    "refresh_daily_session_stats",
+    "run_daily_stats_refresh_loop",
+    "session_event_timings_hourly",
+    "get_session_timing_buckets",
+]
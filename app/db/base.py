@@ -1,9 +1,14 @@
-from sqlalchemy import create_engine, MetaData
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base, sessionmaker, Session
+from sqlalchemy import create_engine, MetaData, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import declarative_base, sessionmaker, Session, validates
 from sqlalchemy.pool import NullPool
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from functools import cached_property, lru_cache, wraps
+from typing import AsyncGenerator, Dict, Optional, Union
+import uuid
 from loguru import logger
 
 from app.config import settings
@@ -25,49 +30,134 @@ metadata = MetaData(
 # Assign metadata to Base
 Base.metadata = metadata
 
-# Create sync engine for migrations and admin tasks
-sync_engine = create_engine(
-    settings.DATABASE_URL,
-    echo=settings.DATABASE_ECHO,
-    pool_size=settings.DATABASE_POOL_SIZE,
-    max_overflow=settings.DATABASE_MAX_OVERFLOW,
-    pool_pre_ping=True,  # Verify connections before use
-    pool_recycle=3600,   # Recycle connections every hour
-)
-
-# Create async engine for main application
-engine = create_async_engine(
-    settings.database_url_async,
-    echo=settings.DATABASE_ECHO,
-    pool_size=settings.DATABASE_POOL_SIZE,
-    max_overflow=settings.DATABASE_MAX_OVERFLOW,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    # Use NullPool for WebSocket connections to prevent pool exhaustion
-    poolclass=NullPool if settings.ENVIRONMENT == "development" else None,
-)
 
-# Create session factories
-SessionLocal = sessionmaker(
-    bind=sync_engine,
-    autocommit=False,
-    autoflush=False,
-    expire_on_commit=False
-)
-
-AsyncSessionLocal = async_sessionmaker(
-    bind=engine,
-    class_=AsyncSession,
-    autocommit=False,
-    autoflush=False,
-    expire_on_commit=False
-)
+class ParticipantSlotsMixin:
+    """Resolve a participant user ID to slot 1/2 for models with user1_id/user2_id"""
+    
+    @cached_property
+    def _slots(self) -> Dict[uuid.UUID, int]:
+        """Map participant user ID -> 1/2; rebuilt when user1_id/user2_id change"""
+        return {self.user2_id: 2, self.user1_id: 1}  # user1 wins if both are equal
+    
+    @validates("user1_id", "user2_id")
+    def _reset_slots(self, key, value):
+        self.__dict__.pop("_slots", None)
+        return value
+    
+    def _slot_for(self, user_id: Optional[uuid.UUID]) -> Optional[int]:
+        return self._slots.get(user_id)
+
+
+# Engines and session factories are created on first use so that importing
+# Base (e.g. from model modules) does not open connection pools.
+_sync_engine: Optional[Engine] = None
+_engine: Optional[AsyncEngine] = None
+_ws_engine: Optional[AsyncEngine] = None
+_session_local: Optional[sessionmaker] = None
+_async_session_local: Optional[async_sessionmaker] = None
+
+
+def get_sync_engine() -> Engine:
+    """Get sync engine for migrations and admin tasks"""
+    global _sync_engine
+    if _sync_engine is None:
+        _sync_engine = create_engine(
+            settings.DATABASE_URL,
+            echo=settings.DATABASE_ECHO,
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+            pool_pre_ping=settings.is_production,  # Verify connections before use (production only)
+            pool_recycle=settings.DATABASE_POOL_RECYCLE,
+        )
+        _register_pool_events(_sync_engine)
+    return _sync_engine
+
+
+def get_engine() -> AsyncEngine:
+    """Get async engine for main application"""
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine(
+            settings.database_url_async,
+            echo=settings.DATABASE_ECHO,
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+            pool_pre_ping=settings.is_production,
+            pool_recycle=settings.DATABASE_POOL_RECYCLE,
+        )
+        _register_pool_events(_engine.sync_engine)
+    return _engine
+
+
+def get_ws_engine() -> AsyncEngine:
+    """Get unpooled async engine for long-lived WebSocket handlers"""
+    global _ws_engine
+    if _ws_engine is None:
+        # NullPool so held WebSocket connections can't exhaust the HTTP pool
+        _ws_engine = create_async_engine(
+            settings.database_url_async,
+            echo=settings.DATABASE_ECHO,
+            poolclass=NullPool,
+        )
+        _register_pool_events(_ws_engine.sync_engine)
+    return _ws_engine
+
+
+def get_session_local() -> sessionmaker:
+    """Get sync session factory"""
+    global _session_local
+    if _session_local is None:
+        _session_local = sessionmaker(
+            bind=get_sync_engine(),
+            autocommit=False,
+            autoflush=False,
+            expire_on_commit=False
+        )
+    return _session_local
+
+
+def get_async_session_local() -> async_sessionmaker:
+    """Get async session factory"""
+    global _async_session_local
+    if _async_session_local is None:
+        _async_session_local = async_sessionmaker(
+            bind=get_engine(),
+            class_=AsyncSession,
+            autocommit=False,
+            autoflush=False,
+            expire_on_commit=False
+        )
+    return _async_session_local
+
+
+# Module attributes kept for backward compatibility (PEP 562)
+_LAZY_ATTRIBUTES = {
+    "sync_engine": get_sync_engine,
+    "engine": get_engine,
+    "ws_engine": get_ws_engine,
+    "SessionLocal": get_session_local,
+    "AsyncSessionLocal": get_async_session_local,
+}
+
+# Declared (never assigned) so type checkers and linters see the lazy names in __all__
+sync_engine: Engine
+engine: AsyncEngine
+ws_engine: AsyncEngine
+SessionLocal: sessionmaker
+AsyncSessionLocal: async_sessionmaker
+
+
+def __getattr__(name: str):
+    factory = _LAZY_ATTRIBUTES.get(name)
+    if factory is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return factory()
 
 
 # Dependency to get sync database session (for migrations, admin tasks)
 def get_sync_db() -> Session:
     """Get synchronous database session"""
-    db = SessionLocal()
+    db = get_session_local()()
     try:
         yield db
     except Exception as e:
@@ -81,7 +171,7 @@ def get_sync_db() -> Session:
 # Dependency to get async database session (main application)
 async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
     """Get asynchronous database session"""
-    async with AsyncSessionLocal() as session:
+    async with get_async_session_local()() as session:
         try:
             yield session
         except Exception as e:
@@ -96,7 +186,7 @@ async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
 @asynccontextmanager
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     """Context manager for async database sessions"""
-    async with AsyncSessionLocal() as session:
+    async with get_async_session_local()() as session:
         try:
             yield session
             await session.commit()
@@ -112,7 +202,7 @@ async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
 @asynccontextmanager
 async def get_sync_session() -> Session:
     """Context manager for sync database sessions"""
-    session = SessionLocal()
+    session = get_session_local()()
     try:
         yield session
         session.commit()
@@ -131,7 +221,7 @@ async def init_db() -> None:
         # Import all models to ensure they're registered
         from app.db.models import user, match, session, message, vocab  # noqa
         
-        async with engine.begin() as conn:
+        async with get_engine().begin() as conn:
             # Create all tables
             await conn.run_sync(Base.metadata.create_all)
             logger.info("✅ Database tables created successfully")
@@ -144,7 +234,7 @@ async def init_db() -> None:
 async def drop_db() -> None:
     """Drop all database tables (use with caution!)"""
     try:
-        async with engine.begin() as conn:
+        async with get_engine().begin() as conn:
             await conn.run_sync(Base.metadata.drop_all)
             logger.warning("🗑️ All database tables dropped")
             
@@ -159,7 +249,7 @@ def init_sync_db() -> None:
         # Import all models
         from app.db.models import user, match, session, message, vocab  # noqa
         
-        Base.metadata.create_all(bind=sync_engine)
+        Base.metadata.create_all(bind=get_sync_engine())
         logger.info("✅ Database tables created successfully (sync)")
         
     except Exception as e:
@@ -168,12 +258,15 @@ def init_sync_db() -> None:
 
 
 # Health check utilities
+_HEALTH_STMT = text("SELECT 1")
+
+
 async def check_db_health() -> bool:
     """Check database connection health"""
     try:
-        async with AsyncSessionLocal() as session:
+        async with get_async_session_local()() as session:
             # Simple query to test connection
-            result = await session.execute("SELECT 1")
+            result = await session.execute(_HEALTH_STMT)
             return result.scalar() == 1
             
     except Exception as e:
@@ -184,8 +277,8 @@ async def check_db_health() -> bool:
 def check_sync_db_health() -> bool:
     """Check sync database connection health"""
     try:
-        with SessionLocal() as session:
-            result = session.execute("SELECT 1")
+        with get_session_local()() as session:
+            result = session.execute(_HEALTH_STMT)
             return result.scalar() == 1
             
     except Exception as e:
@@ -217,7 +310,7 @@ class DatabaseTransaction:
 async def get_db_stats() -> dict:
     """Get database connection pool statistics"""
     try:
-        pool = engine.pool
+        pool = get_engine().pool
         return {
             "pool_size": pool.size(),
             "checked_in": pool.checkedin(),
@@ -231,16 +324,38 @@ async def get_db_stats() -> dict:
 
 
 # Utility functions for common operations
-async def execute_raw_query(query: str, params: dict = None) -> list:
+def retry_on_disconnect(func):
+    """Retry an async DB call once if its pooled connection turned out to be stale"""
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await func(*args, **kwargs)
+        except DBAPIError as e:
+            if not e.connection_invalidated:
+                raise
+            logger.warning("Stale database connection invalidated, retrying: {}", e)
+            return await func(*args, **kwargs)
+    return wrapper
+
+
+@lru_cache(maxsize=256)
+def _text_clause(query: str) -> TextClause:
+    """Build (and memoize) a text() construct so repeat queries hit the statement cache"""
+    return text(query)
+
+
+@retry_on_disconnect
+async def execute_raw_query(query: Union[str, TextClause], params: dict = None) -> list:
     """Execute raw SQL query safely"""
-    async with AsyncSessionLocal() as session:
+    statement = _text_clause(query) if isinstance(query, str) else query
+    async with get_async_session_local()() as session:
         try:
-            result = await session.execute(query, params or {})
-            if query.strip().lower().startswith(('insert', 'update', 'delete')):
+            result = await session.execute(statement, params or {})
+            if statement.text.strip().lower().startswith(('insert', 'update', 'delete')):
                 await session.commit()
                 return [{"affected_rows": result.rowcount}]
             else:
-                return [dict(row) for row in result.fetchall()]
+                return result.mappings().all()
         except Exception as e:
             await session.rollback()
             logger.error(f"Raw query execution failed: {e}")
@@ -249,43 +364,55 @@ async def execute_raw_query(query: str, params: dict = None) -> list:
 
 # Database connection event handlers
 from sqlalchemy import event
-from sqlalchemy.pool import Pool
 
-@event.listens_for(Pool, "connect")
+
 def set_sqlite_pragma(dbapi_connection, connection_record):
     """Set database-specific settings on connection"""
-    if 'postgresql' in settings.DATABASE_URL:
-        # Set PostgreSQL specific settings
-        cursor = dbapi_connection.cursor()
-        # Set timezone to UTC
-        cursor.execute("SET timezone TO 'UTC'")
-        # Set statement timeout (30 seconds)
-        cursor.execute("SET statement_timeout TO '30s'")
-        cursor.close()
+    # Set PostgreSQL specific settings
+    cursor = dbapi_connection.cursor()
+    # Set timezone to UTC
+    cursor.execute("SET timezone TO 'UTC'")
+    # Set statement timeout (30 seconds)
+    cursor.execute("SET statement_timeout TO '30s'")
+    cursor.close()
 
 
-@event.listens_for(Pool, "checkout")
 def receive_checkout(dbapi_connection, connection_record, connection_proxy):
     """Log database connection checkout"""
-    if settings.DATABASE_ECHO:
-        logger.debug("Database connection checked out from pool")
+    logger.debug("Database connection checked out from pool")
 
 
-@event.listens_for(Pool, "checkin")
 def receive_checkin(dbapi_connection, connection_record):
     """Log database connection checkin"""
+    logger.debug("Database connection checked in to pool")
+
+
+def _register_pool_events(target: Engine) -> None:
+    """Attach pool listeners to one of our engines rather than the global Pool class"""
+    if target.dialect.name == "postgresql":
+        event.listen(target, "connect", set_sqlite_pragma)
+    
+    # Checkout/checkin fire on every query; only pay for them when echoing
     if settings.DATABASE_ECHO:
-        logger.debug("Database connection checked in to pool")
+        event.listen(target, "checkout", receive_checkout)
+        event.listen(target, "checkin", receive_checkin)
 
 
 # Export commonly used items
 __all__ = [
+    "ParticipantSlotsMixin",
     "Base",
     "metadata", 
     "engine",
+    "ws_engine",
     "sync_engine",
     "AsyncSessionLocal",
     "SessionLocal",
+    "get_engine",
+    "get_ws_engine",
+    "get_sync_engine",
+    "get_session_local",
+    "get_async_session_local",
     "get_async_db",
     "get_sync_db",
     "get_async_session",
@@ -297,5 +424,6 @@ __all__ = [
     "check_sync_db_health",
     "DatabaseTransaction",
     "get_db_stats",
-    "execute_raw_query"
+    "execute_raw_query",
+    "retry_on_disconnect",
 ]
\ No newline at end of file
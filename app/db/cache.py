@@ -0,0 +1,172 @@
+import redis.asyncio as aioredis
+import asyncio
+import uuid
+from datetime import datetime
+from typing import Dict, Mapping, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from loguru import logger
+
+from app.config import settings
+from app.core.redis_client import get_redis
+from app.db.base import get_async_session_local
+from app.db.models.session import Session, HOT_COUNTER_FIELDS, HOT_VALUE_FIELDS
+from app.utils.clock import now_utc
+
+_DIRTY_SET = "sessions:dirty"
+_TIMESTAMP_FIELDS = frozenset({"last_activity_at", "user1_last_seen", "user2_last_seen"})
+
+
+def _decode_state(raw: Mapping[bytes, bytes]) -> Dict:
+    """Convert a Redis hash into Session.apply_hot_state / write_hot_state values"""
+    state = {}
+    for key, value in raw.items():
+        field = key.decode()
+        if field in HOT_COUNTER_FIELDS:
+            state[field] = int(value)
+        elif field in _TIMESTAMP_FIELDS:
+            state[field] = datetime.fromisoformat(value.decode())
+        elif field in HOT_VALUE_FIELDS:
+            state[field] = value == b"1"
+    return state
+
+
+class SessionStateCache:
+    """Redis write-through cache for high-frequency session fields
+    
+    Chat events update a hash at session:{id} (counter deltas, last-seen times,
+    typing flags) and mark the session dirty; Postgres only sees them on flush()
+    or when a caller pops the state to pause/resume/end the session.
+    """
+    
+    def __init__(self, redis_client: aioredis.Redis):
+        self.redis = redis_client
+    
+    def _key(self, session_id: uuid.UUID) -> str:
+        return f"session:{session_id}"
+    
+    async def record_activity(self, session_id: uuid.UUID, slot: Optional[int] = None,
+                              now: Optional[datetime] = None):
+        """Buffer Session.update_activity; slot is 1/2 for the acting participant"""
+        now = (now or now_utc()).isoformat()
+        mapping = {"last_activity_at": now}
+        if slot is not None:
+            mapping[f"user{slot}_last_seen"] = now
+        
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hset(self._key(session_id), mapping=mapping)
+            pipe.sadd(_DIRTY_SET, str(session_id))
+            await pipe.execute()
+    
+    async def record_message(self, session_id: uuid.UUID, slot: int, now: Optional[datetime] = None):
+        """Buffer Session.increment_message_count plus the activity it implies"""
+        key = self._key(session_id)
+        now = (now or now_utc()).isoformat()
+        
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hincrby(key, "total_messages", 1)
+            pipe.hincrby(key, f"user{slot}_message_count", 1)
+            pipe.hset(key, mapping={"last_activity_at": now, f"user{slot}_last_seen": now})
+            pipe.sadd(_DIRTY_SET, str(session_id))
+            await pipe.execute()
+    
+    async def set_typing(self, session_id: uuid.UUID, slot: int, is_typing: bool,
+                         now: Optional[datetime] = None):
+        """Buffer Session.set_typing_status"""
+        mapping = {f"user{slot}_typing": "1" if is_typing else "0"}
+        if is_typing:
+            now = (now or now_utc()).isoformat()
+            mapping["last_activity_at"] = now
+            mapping[f"user{slot}_last_seen"] = now
+        
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hset(self._key(session_id), mapping=mapping)
+            pipe.sadd(_DIRTY_SET, str(session_id))
+            await pipe.execute()
+    
+    async def pop(self, session_id: uuid.UUID) -> Dict:
+        """Take and clear a session's buffered state, e.g. before pause/resume/end
+        
+        Apply the result with Session.apply_hot_state before committing.
+        """
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hgetall(self._key(session_id))
+            pipe.delete(self._key(session_id))
+            pipe.srem(_DIRTY_SET, str(session_id))
+            raw, _, _ = await pipe.execute()
+        return _decode_state(raw)
+    
+    async def flush(self, db: AsyncSession, batch_size: int = 500) -> int:
+        """Write buffered state for up to batch_size dirty sessions to Postgres
+        
+        Returns the number of sessions flushed. On failure the state is put back.
+        """
+        session_ids = await self.redis.spop(_DIRTY_SET, batch_size)
+        if not session_ids:
+            return 0
+        
+        # Snapshot-and-clear each hash atomically; events arriving later re-mark it dirty
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for session_id in session_ids:
+                key = self._key(session_id.decode())
+                pipe.hgetall(key)
+                pipe.delete(key)
+            results = await pipe.execute()
+        
+        states = {
+            uuid.UUID(session_id.decode()): _decode_state(raw)
+            for session_id, raw in zip(session_ids, results[::2])
+            if raw
+        }
+        
+        try:
+            await Session.write_hot_state(db, states)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            await self._restore(states)
+            raise
+        
+        return len(states)
+    
+    async def _restore(self, states: Mapping[uuid.UUID, Mapping]):
+        """Put snapshotted state back after a failed flush without overwriting newer values"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for session_id, state in states.items():
+                key = self._key(session_id)
+                for field, value in state.items():
+                    if field in HOT_COUNTER_FIELDS:
+                        pipe.hincrby(key, field, value)
+                    elif field in _TIMESTAMP_FIELDS:
+                        pipe.hsetnx(key, field, value.isoformat())
+                    else:
+                        pipe.hsetnx(key, field, "1" if value else "0")
+                pipe.sadd(_DIRTY_SET, str(session_id))
+            await pipe.execute()
+
+
+async def run_flush_loop(cache: SessionStateCache, interval_seconds: float):
+    """Periodically flush dirty sessions until cancelled (started from the app lifespan)"""
+    session_factory = get_async_session_local()
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            async with session_factory() as db:
+                # Drain the backlog, one batch per statement
+                while await cache.flush(db, settings.SESSION_HOT_STATE_FLUSH_BATCH):
+                    pass
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Session state flush failed: {}", e)
+
+
+# Shared cache instance
+session_state_cache = SessionStateCache(get_redis())
+
+
+# Export commonly used items
+__all__ = [
+    "SessionStateCache",
+    "session_state_cache",
+    "run_flush_loop",
+]
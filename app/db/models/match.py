@@ -1,31 +1,46 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, JSON, Enum as SQLEnum, ForeignKey, UniqueConstraint, Index
-from sqlalchemy.dialects.postgresql import UUID, ARRAY
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, UniqueConstraint, Index, select, exists, case, and_, update, insert, or_
+from sqlalchemy.dialects.postgresql import UUID, ARRAY, JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred, load_only
 import uuid
 import enum
+import json
+import warnings
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+from typing import AsyncIterator, Iterable, List, Dict, NamedTuple, Optional, Sequence, Tuple
 
-from app.db.base import Base
+from app.db.base import Base, ParticipantSlotsMixin
+from app.db.types import IntEnumType
+from app.utils.clock import now_utc
 
 
-class MatchCandidateStatus(enum.Enum):
-    """Match candidate status enumeration"""
-    IDLE = "idle"                    # Available for matching
-    QUEUED = "queued"               # In matching queue
-    PROPOSED = "proposed"           # Has pending match proposal
-    MATCHED = "matched"             # Currently in active session
-    COOLDOWN = "cooldown"          # Temporary cooldown after rejection
+class MatchCandidateStatus(enum.IntEnum):
+    """Match candidate status enumeration (stored as SMALLINT; values must never be renumbered)"""
+    IDLE = 1                        # Available for matching
+    QUEUED = 2                      # In matching queue
+    PROPOSED = 3                    # Has pending match proposal
+    MATCHED = 4                     # Currently in active session
+    COOLDOWN = 5                    # Temporary cooldown after rejection
 
 
-class MatchState(enum.Enum):
-    """Match state enumeration"""
-    PROPOSED = "proposed"           # Match proposed to both users
-    ACCEPTED = "accepted"           # Both users accepted, session can be created
-    REJECTED = "rejected"           # One or both users rejected
-    EXPIRED = "expired"            # Proposal timed out
-    SESSION_CREATED = "session_created"  # Session successfully created
+class MatchState(enum.IntEnum):
+    """Match state enumeration (stored as SMALLINT; values must never be renumbered)"""
+    PROPOSED = 1                    # Match proposed to both users
+    ACCEPTED = 2                    # Both users accepted, session can be created
+    REJECTED = 3                    # One or both users rejected
+    EXPIRED = 4                     # Proposal timed out
+    SESSION_CREATED = 5             # Session successfully created
+
+
+# Rolling window for MatchCandidate.can_reject_more_today
+REJECTION_WINDOW = timedelta(days=1)
+
+
+def _now(now: Optional[datetime] = None) -> datetime:
+    """Current UTC time, unless the caller already took one (e.g. once per matcher tick)"""
+    return now if now is not None else now_utc()
 
 
 class MatchCandidate(Base):
@@ -37,7 +52,7 @@ class MatchCandidate(Base):
                      nullable=False, unique=True, index=True)
     
     # Current matching status
-    status = Column(SQLEnum(MatchCandidateStatus), default=MatchCandidateStatus.IDLE, nullable=False)
+    status = Column(IntEnumType(MatchCandidateStatus), default=MatchCandidateStatus.IDLE, nullable=False)
     
     # Queue and matching metadata
     queued_at = Column(DateTime(timezone=True), nullable=True)
@@ -45,7 +60,7 @@ class MatchCandidate(Base):
     queue_priority = Column(Float, default=0.0, nullable=False)  # For priority matching (Pro users)
     
     # Quality metrics for matching algorithm
-    average_rating = Column(Float, default=5.0, nullable=False)  # 1-5 scale
+    rating_sum = Column(Float, default=0.0, nullable=False)  # Sum of 1-5 ratings; see average_rating
     total_ratings = Column(Integer, default=0, nullable=False)
     strike_count = Column(Integer, default=0, nullable=False)  # For repeated bad behavior
     successful_matches = Column(Integer, default=0, nullable=False)
@@ -56,8 +71,8 @@ class MatchCandidate(Base):
     # Cooldown management
     cooldown_until = Column(DateTime(timezone=True), nullable=True)
     cooldown_reason = Column(String(100), nullable=True)
-    rejection_count_today = Column(Integer, default=0, nullable=False)
-    last_rejection_reset = Column(DateTime(timezone=True), nullable=True)
+    # Rejection times within the last day; trimmed on write so reads never need a reset
+    recent_rejections = Column(ARRAY(DateTime(timezone=True)), nullable=False, default=[])
     
     # Matching preferences (can override user defaults)
     preferred_session_length = Column(Integer, nullable=True)  # Minutes, null = use user default
@@ -65,7 +80,7 @@ class MatchCandidate(Base):
     same_timezone_only = Column(Boolean, default=False, nullable=False)
     
     # Current active match
-    current_match_id = Column(UUID(as_uuid=True), ForeignKey("matches.id"), nullable=True, index=True)
+    current_match_id = Column(UUID(as_uuid=True), ForeignKey("matches.id"), nullable=True)
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -73,14 +88,24 @@ class MatchCandidate(Base):
     
     # Relationships
     # user = relationship("User", back_populates="match_candidate")
-    # current_match = relationship("Match", foreign_keys=[current_match_id])
+    # Joined eagerly: callers reading a candidate almost always need its active match
+    current_match = relationship("Match", foreign_keys=[current_match_id], lazy="joined")
     
     # Indexes
+    # Indexes (each one costs a B-tree write per INSERT/UPDATE; add only for a known query):
+    #   user_id (unique)                    - candidate lookup by user
+    #   ix_match_candidate_queue_poll       - matcher polling, partial on QUEUED
+    #   ix_match_candidate_cooldown_active  - cooldown expiry, partial on COOLDOWN
+    #   ix_match_candidate_last_match       - recency filters
+    #   ix_match_candidate_blocked_gin      - blocklist containment (blocks_expression)
+    # current_match_id is intentionally unindexed: candidates are read by user_id.
     __table_args__ = (
-        Index('ix_match_candidate_status_queued', 'status', 'queued_at'),
-        Index('ix_match_candidate_priority', 'queue_priority', 'queued_at'),
-        Index('ix_match_candidate_cooldown', 'cooldown_until'),
+        Index('ix_match_candidate_queue_poll', queue_priority.desc(), queued_at,
+              postgresql_where=status == MatchCandidateStatus.QUEUED),
+        Index('ix_match_candidate_cooldown_active', cooldown_until,
+              postgresql_where=status == MatchCandidateStatus.COOLDOWN),
         Index('ix_match_candidate_last_match', 'last_match_at'),
+        Index('ix_match_candidate_blocked_gin', 'blocked_user_ids', postgresql_using='gin'),
     )
     
     def __repr__(self):
@@ -89,24 +114,42 @@ class MatchCandidate(Base):
     @property
     def is_available(self) -> bool:
         """Check if candidate is available for matching"""
-        now = datetime.utcnow()
+        return self.available_at(_now())
+    
+    def available_at(self, now: datetime) -> bool:
+        """Check if candidate is available for matching at the given time"""
         return (
             self.status == MatchCandidateStatus.IDLE and
             (self.cooldown_until is None or self.cooldown_until <= now) and
             self.strike_count < 3  # Max strikes before temporary ban
         )
     
+    @hybrid_property
+    def average_rating(self) -> float:
+        """Average rating on a 1-5 scale, 5.0 until the first rating"""
+        if not self.total_ratings:
+            return 5.0
+        return self.rating_sum / self.total_ratings
+    
+    @average_rating.expression
+    def average_rating(cls):
+        return case((cls.total_ratings == 0, 5.0), else_=cls.rating_sum / cls.total_ratings)
+    
     @property
     def is_in_cooldown(self) -> bool:
         """Check if candidate is in cooldown"""
+        return self.in_cooldown_at(_now())
+    
+    def in_cooldown_at(self, now: datetime) -> bool:
+        """Check if candidate is in cooldown at the given time"""
         if self.cooldown_until is None:
             return False
-        return datetime.utcnow() < self.cooldown_until
+        return now < self.cooldown_until
     
-    def add_to_queue(self, priority: float = 0.0):
+    def add_to_queue(self, priority: float = 0.0, *, now: Optional[datetime] = None):
         """Add candidate to matching queue"""
         self.status = MatchCandidateStatus.QUEUED
-        self.queued_at = datetime.utcnow()
+        self.queued_at = _now(now)
         self.queue_priority = priority
     
     def remove_from_queue(self):
@@ -115,74 +158,188 @@ class MatchCandidate(Base):
         self.queued_at = None
         self.queue_priority = 0.0
     
-    def add_cooldown(self, duration_minutes: int, reason: str = "rejection"):
+    def add_cooldown(self, duration_minutes: int, reason: str = "rejection", *, now: Optional[datetime] = None):
         """Add cooldown period"""
         self.status = MatchCandidateStatus.COOLDOWN
-        self.cooldown_until = datetime.utcnow() + timedelta(minutes=duration_minutes)
+        self.cooldown_until = _now(now) + timedelta(minutes=duration_minutes)
         self.cooldown_reason = reason
     
+    @classmethod
+    async def try_enqueue(cls, session: AsyncSession, candidate_id: uuid.UUID, priority: float = 0.0) -> bool:
+        """Atomically move an IDLE candidate into the queue; False if it raced into another state"""
+        stmt = (
+            update(cls)
+            .where(cls.id == candidate_id, cls.status == MatchCandidateStatus.IDLE)
+            .values(status=MatchCandidateStatus.QUEUED, queued_at=func.now(), queue_priority=priority)
+            .returning(cls.id)
+            .execution_options(synchronize_session=False)
+        )
+        result = await session.execute(stmt)
+        return result.first() is not None
+    
+    @classmethod
+    async def try_dequeue(cls, session: AsyncSession, candidate_id: uuid.UUID) -> bool:
+        """Atomically take a QUEUED candidate back to IDLE; False if it was no longer queued"""
+        stmt = (
+            update(cls)
+            .where(cls.id == candidate_id, cls.status == MatchCandidateStatus.QUEUED)
+            .values(status=MatchCandidateStatus.IDLE, queued_at=None, queue_priority=0.0)
+            .returning(cls.id)
+            .execution_options(synchronize_session=False)
+        )
+        result = await session.execute(stmt)
+        return result.first() is not None
+    
+    @classmethod
+    async def try_cooldown(cls, session: AsyncSession, candidate_id: uuid.UUID,
+                           duration_minutes: int, reason: str = "rejection") -> bool:
+        """Atomically put a candidate into cooldown; False if it already was in cooldown"""
+        stmt = (
+            update(cls)
+            .where(cls.id == candidate_id, cls.status != MatchCandidateStatus.COOLDOWN)
+            .values(
+                status=MatchCandidateStatus.COOLDOWN,
+                cooldown_until=func.now() + timedelta(minutes=duration_minutes),
+                cooldown_reason=reason,
+            )
+            .returning(cls.id)
+            .execution_options(synchronize_session=False)
+        )
+        result = await session.execute(stmt)
+        return result.first() is not None
+    
     def add_rating(self, rating: float):
-        """Add new rating and update average"""
-        total_score = self.average_rating * self.total_ratings
+        """Add new rating; the average is derived on read"""
+        self.rating_sum += rating
         self.total_ratings += 1
-        self.average_rating = (total_score + rating) / self.total_ratings
     
-    def add_strike(self):
+    def add_strike(self, *, now: Optional[datetime] = None):
         """Add behavioral strike"""
         self.strike_count += 1
         if self.strike_count >= 3:
-            self.add_cooldown(60 * 24, "excessive_strikes")  # 24 hour cooldown
+            self.add_cooldown(60 * 24, "excessive_strikes", now=now)  # 24 hour cooldown
     
-    def reset_daily_rejections(self):
-        """Reset daily rejection count"""
-        today = datetime.utcnow().date()
-        if self.last_rejection_reset is None or self.last_rejection_reset.date() < today:
-            self.rejection_count_today = 0
-            self.last_rejection_reset = datetime.utcnow()
+    def record_rejection(self, *, now: Optional[datetime] = None):
+        """Record a rejection, dropping entries older than the rejection window"""
+        now = _now(now)
+        cutoff = now - REJECTION_WINDOW
+        self.recent_rejections = [t for t in (self.recent_rejections or []) if t > cutoff] + [now]
     
-    def can_reject_more_today(self, max_rejections: int = 10) -> bool:
-        """Check if user can reject more matches today"""
-        self.reset_daily_rejections()
-        return self.rejection_count_today < max_rejections
+    def can_reject_more_today(self, max_rejections: int = 10, *, now: Optional[datetime] = None) -> bool:
+        """Check if user can reject more matches in the rolling rejection window (read-only)"""
+        cutoff = _now(now) - REJECTION_WINDOW
+        return sum(1 for t in (self.recent_rejections or []) if t > cutoff) < max_rejections
     
     def is_blocked_user(self, user_id: uuid.UUID) -> bool:
-        """Check if user is in blocklist"""
+        """Check if user is in blocklist (already-loaded instances only; prefer any_blocks)"""
         return user_id in (self.blocked_user_ids or [])
     
+    @classmethod
+    def queue_poll_query(cls, limit: int):
+        """Next queued candidates in matching order (served by ix_match_candidate_queue_poll)"""
+        return (
+            select(cls)
+            .where(cls.status == MatchCandidateStatus.QUEUED)
+            .order_by(cls.queue_priority.desc(), cls.queued_at)
+            .limit(limit)
+        )
+    
+    @classmethod
+    def blocks_expression(cls, user_id: uuid.UUID):
+        """SQL predicate: candidate has user_id in its blocklist"""
+        # @> is served by the GIN index; "= ANY(...)" would not be
+        return cls.blocked_user_ids.contains([user_id])
+    
+    @classmethod
+    async def any_blocks(cls, session: AsyncSession, candidate_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+        """Check in SQL whether a candidate blocks user_id, without loading the blocklist"""
+        stmt = select(exists().where(cls.id == candidate_id, cls.blocks_expression(user_id)))
+        return bool(await session.scalar(stmt))
+    
     def block_user(self, user_id: uuid.UUID):
-        """Add user to blocklist"""
+        """Add user to blocklist in memory (prefer MatchCandidate.block)"""
         if self.blocked_user_ids is None:
             self.blocked_user_ids = []
         if user_id not in self.blocked_user_ids:
             self.blocked_user_ids.append(user_id)
     
     def unblock_user(self, user_id: uuid.UUID):
-        """Remove user from blocklist"""
+        """Remove user from blocklist in memory (prefer MatchCandidate.unblock)"""
         if self.blocked_user_ids and user_id in self.blocked_user_ids:
             self.blocked_user_ids.remove(user_id)
+    
+    @classmethod
+    async def block(cls, session: AsyncSession, candidate_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+        """Append user_id to a candidate's blocklist server-side; returns False if already blocked"""
+        stmt = (
+            update(cls)
+            .where(cls.id == candidate_id, ~cls.blocks_expression(user_id))
+            .values(blocked_user_ids=func.array_append(
+                cls.blocked_user_ids, user_id, type_=cls.blocked_user_ids.type
+            ))
+            .execution_options(synchronize_session=False)
+        )
+        result = await session.execute(stmt)
+        return result.rowcount > 0
+    
+    @classmethod
+    async def unblock(cls, session: AsyncSession, candidate_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+        """Remove user_id from a candidate's blocklist server-side; returns False if it wasn't blocked"""
+        stmt = (
+            update(cls)
+            .where(cls.id == candidate_id, cls.blocks_expression(user_id))
+            .values(blocked_user_ids=func.array_remove(
+                cls.blocked_user_ids, user_id, type_=cls.blocked_user_ids.type
+            ))
+            .execution_options(synchronize_session=False)
+        )
+        result = await session.execute(stmt)
+        return result.rowcount > 0
+
+
+# Weights for different matching factors
+_QUALITY_WEIGHTS: Tuple[Tuple[str, float], ...] = (
+    ('level_affinity', 0.25),
+    ('native_target_match', 0.30),
+    ('interest_overlap', 0.20),
+    ('timezone_overlap', 0.15),
+    ('quality_score', 0.10),
+)
+QUALITY_FACTORS: Tuple[str, ...] = tuple(factor for factor, _ in _QUALITY_WEIGHTS)
+
+# Unbound method: skips the per-call attribute lookup in to_dict
+_iso = datetime.isoformat
 
+# Per-slot (response, responded_at) attribute names on Match
+_RESPONSE_ATTRS = {
+    1: ("user1_response", "user1_responded_at"),
+    2: ("user2_response", "user2_responded_at"),
+}
 
-class Match(Base):
+
+class Match(ParticipantSlotsMixin, Base):
     """Match between two users"""
     __tablename__ = "matches"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     
     # Matched users
+    # Indexed through ix_match_user1_state / ix_match_user2_state below
     user1_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), 
-                      nullable=False, index=True)
+                      nullable=False)
     user2_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), 
-                      nullable=False, index=True)
+                      nullable=False)
     
     # Language configuration for this match
-    languages = Column(JSON, nullable=False)  # {"primary": "ja", "secondary": "en"}
+    languages = Column(JSONB, nullable=False)  # {"primary": "ja", "secondary": "en"}
     
     # Match quality and metadata
     match_score = Column(Float, nullable=False)  # Matching algorithm score
-    matching_factors = Column(JSON, nullable=False)  # What made this a good match
+    # Deferred: heavy and only needed for detail views (undefer(Match.matching_factors) to load it)
+    matching_factors = deferred(Column(JSONB, nullable=False))  # What made this a good match
     
     # Match state and lifecycle
-    state = Column(SQLEnum(MatchState), default=MatchState.PROPOSED, nullable=False)
+    state = Column(IntEnumType(MatchState), default=MatchState.PROPOSED, nullable=False)
     proposed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     expires_at = Column(DateTime(timezone=True), nullable=False)  # Proposal expiry
     
@@ -208,81 +365,130 @@ class Match(Base):
     # user2 = relationship("User", foreign_keys=[user2_id])
     # session = relationship("Session", back_populates="match")
     
-    # Constraints and indexes
+    # Constraints and indexes (id is covered by the primary key; session_id indexed inline):
+    #   uq_match_users            - one match row per pair; also serves (user1_id) prefix lookups
+    #   ix_match_state_expires    - state-filtered queries ordered/bounded by expiry
+    #   ix_match_proposed_expiry  - expiry sweeper, partial on PROPOSED
+    #   ix_match_users_state      - pair + state lookups
+    #   ix_match_user1/2_state    - "does user X have a match in state S", either side
+    #   ix_match_proposed_at      - recency listings
+    #   ix_match_lang_primary     - analytics by primary language
     __table_args__ = (
         UniqueConstraint('user1_id', 'user2_id', name='uq_match_users'),
         Index('ix_match_state_expires', 'state', 'expires_at'),
+        # Expiry sweeper (bulk_expire): only pending proposals, bounded by the proposal TTL
+        Index('ix_match_proposed_expiry', expires_at, postgresql_where=state == MatchState.PROPOSED),
         Index('ix_match_users_state', 'user1_id', 'user2_id', 'state'),
+        Index('ix_match_user1_state', 'user1_id', 'state'),
+        Index('ix_match_user2_state', 'user2_id', 'state'),
         Index('ix_match_proposed_at', 'proposed_at'),
+        Index('ix_match_lang_primary', languages['primary'].astext),
+    )
+    
+    # Columns rendered by to_summary_dict (list views)
+    SUMMARY_COLUMNS: Tuple[str, ...] = (
+        "id", "state", "match_score", "proposed_at", "expires_at", "user1_id", "user2_id",
     )
     
     def __repr__(self):
         return f"<Match(id={self.id}, user1={self.user1_id}, user2={self.user2_id}, state={self.state})>"
     
-    @property
+    @classmethod
+    async def list_for_user(cls, session: AsyncSession, user_id: uuid.UUID, limit: int = 50) -> List["Match"]:
+        """Most recent matches for a user, loading only SUMMARY_COLUMNS"""
+        stmt = (
+            select(cls)
+            .options(load_only(*(getattr(cls, name) for name in cls.SUMMARY_COLUMNS)))
+            .where(or_(cls.user1_id == user_id, cls.user2_id == user_id))
+            .order_by(cls.proposed_at.desc())
+            .limit(limit)
+        )
+        result = await session.scalars(stmt)
+        return list(result)
+    
+    @hybrid_property
     def is_expired(self) -> bool:
         """Check if match proposal has expired"""
-        return datetime.utcnow() > self.expires_at
+        return self.expired_at(_now())
     
-    @property
+    @is_expired.expression
+    def is_expired(cls):
+        return cls.expires_at < func.now()
+    
+    @hybrid_property
     def is_pending(self) -> bool:
         """Check if match is waiting for user responses"""
-        return self.state == MatchState.PROPOSED and not self.is_expired
+        return self.pending_at(_now())
     
-    @property
+    @is_pending.expression
+    def is_pending(cls):
+        return and_(cls.state == MatchState.PROPOSED, cls.expires_at >= func.now())
+    
+    def expired_at(self, now: datetime) -> bool:
+        """Check if match proposal has expired at the given time"""
+        return now > self.expires_at
+    
+    def pending_at(self, now: datetime) -> bool:
+        """Check if match is waiting for user responses at the given time"""
+        return self.state == MatchState.PROPOSED and not self.expired_at(now)
+    
+    @hybrid_property
     def is_fully_responded(self) -> bool:
         """Check if both users have responded"""
         return self.user1_response is not None and self.user2_response is not None
     
-    @property
+    @is_fully_responded.expression
+    def is_fully_responded(cls):
+        return and_(cls.user1_response.isnot(None), cls.user2_response.isnot(None))
+    
+    @hybrid_property
     def is_accepted_by_both(self) -> bool:
         """Check if both users accepted the match"""
         return self.user1_response == "accepted" and self.user2_response == "accepted"
     
+    @is_accepted_by_both.expression
+    def is_accepted_by_both(cls):
+        return and_(cls.user1_response == "accepted", cls.user2_response == "accepted")
+    
     def get_partner_id(self, user_id: uuid.UUID) -> uuid.UUID:
         """Get partner's user ID"""
-        if user_id == self.user1_id:
-            return self.user2_id
-        elif user_id == self.user2_id:
-            return self.user1_id
-        else:
+        slot = self._slot_for(user_id)
+        if slot is None:
             raise ValueError("User ID not found in this match")
+        return self.user2_id if slot == 1 else self.user1_id
     
     def get_user_response(self, user_id: uuid.UUID) -> Optional[str]:
         """Get user's response to match proposal"""
-        if user_id == self.user1_id:
-            return self.user1_response
-        elif user_id == self.user2_id:
-            return self.user2_response
-        return None
+        slot = self._slot_for(user_id)
+        if slot is None:
+            return None
+        return getattr(self, _RESPONSE_ATTRS[slot][0])
     
-    def set_user_response(self, user_id: uuid.UUID, response: str):
+    def set_user_response(self, user_id: uuid.UUID, response: str, *, now: Optional[datetime] = None):
         """Set user's response to match proposal"""
-        now = datetime.utcnow()
-        
-        if user_id == self.user1_id:
-            self.user1_response = response
-            self.user1_responded_at = now
-        elif user_id == self.user2_id:
-            self.user2_response = response
-            self.user2_responded_at = now
-        else:
+        slot = self._slot_for(user_id)
+        if slot is None:
             raise ValueError("User ID not found in this match")
         
+        response_attr, responded_at_attr = _RESPONSE_ATTRS[slot]
+        setattr(self, response_attr, response)
+        now = _now(now)
+        setattr(self, responded_at_attr, now)
+        
         # Update match state if both responded
-        self._update_state_after_response()
+        self._update_state_after_response(now)
     
-    def _update_state_after_response(self):
+    def _update_state_after_response(self, now: datetime):
         """Update match state based on user responses"""
         if not self.is_fully_responded:
             return
         
         if self.is_accepted_by_both:
             self.state = MatchState.ACCEPTED
-            self.accepted_at = datetime.utcnow()
+            self.accepted_at = now
         else:
             self.state = MatchState.REJECTED
-            self.completed_at = datetime.utcnow()
+            self.completed_at = now
             
             # Set rejection reason
             if self.user1_response == "rejected" and self.user2_response == "rejected":
@@ -292,10 +498,32 @@ class Match(Base):
             else:
                 self.rejection_reason = "user2_rejected"
     
-    def expire_match(self):
-        """Mark match as expired"""
+    @classmethod
+    async def bulk_expire(cls, session: AsyncSession) -> int:
+        """Expire all timed-out proposals in one UPDATE; returns the number of matches expired"""
+        stmt = (
+            update(cls)
+            .where(cls.state == MatchState.PROPOSED, cls.expires_at < func.now())
+            .values(
+                state=MatchState.EXPIRED,
+                completed_at=func.now(),
+                user1_response=func.coalesce(cls.user1_response, "timeout"),
+                user2_response=func.coalesce(cls.user2_response, "timeout"),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        result = await session.execute(stmt)
+        return result.rowcount
+    
+    def expire_match(self, *, now: Optional[datetime] = None):
+        """Mark match as expired (deprecated: use Match.bulk_expire)"""
+        warnings.warn(
+            "Match.expire_match is deprecated; use Match.bulk_expire",
+            DeprecationWarning,
+            stacklevel=2
+        )
         self.state = MatchState.EXPIRED
-        self.completed_at = datetime.utcnow()
+        self.completed_at = _now(now)
         
         # Set responses for users who didn't respond
         if self.user1_response is None:
@@ -310,67 +538,95 @@ class Match(Base):
     
     def calculate_match_quality_score(self, factors: Dict) -> float:
         """Calculate overall match quality from individual factors"""
-        # Weights for different matching factors
-        weights = {
-            'level_affinity': 0.25,
-            'native_target_match': 0.30,
-            'interest_overlap': 0.20,
-            'timezone_overlap': 0.15,
-            'quality_score': 0.10,
-        }
-        
         score = 0.0
-        for factor, weight in weights.items():
+        for factor, weight in _QUALITY_WEIGHTS:
             if factor in factors:
                 score += factors[factor] * weight
         
         return min(1.0, max(0.0, score))  # Clamp between 0 and 1
     
-    def to_dict(self, current_user_id: Optional[uuid.UUID] = None) -> Dict:
-        """Convert match to dictionary"""
+    @staticmethod
+    def score_batch(factor_rows: Iterable[Sequence[float]]) -> List[float]:
+        """Score many candidate pairs at once
+        
+        Each row holds the factors in QUALITY_FACTORS order; missing factors should be 0.0.
+        """
+        (_, w1), (_, w2), (_, w3), (_, w4), (_, w5) = _QUALITY_WEIGHTS
+        return [
+            min(1.0, max(0.0, f1 * w1 + f2 * w2 + f3 * w3 + f4 * w4 + f5 * w5))
+            for f1, f2, f3, f4, f5 in factor_rows
+        ]
+    
+    def to_dict(self, current_user_id: Optional[uuid.UUID] = None, *, now: Optional[datetime] = None) -> Dict:
+        """Convert match to dictionary (matching_factors must be loaded, see undefer)"""
+        now = _now(now)
         data = {
             "id": str(self.id),
-            "state": self.state.value,
+            "state": self.state.name.lower(),
             "languages": self.languages,
             "match_score": self.match_score,
             "matching_factors": self.matching_factors,
-            "proposed_at": self.proposed_at.isoformat(),
-            "expires_at": self.expires_at.isoformat(),
-            "is_expired": self.is_expired,
-            "is_pending": self.is_pending,
+            "proposed_at": _iso(self.proposed_at),
+            "expires_at": _iso(self.expires_at),
+            "is_expired": self.expired_at(now),
+            "is_pending": self.pending_at(now),
         }
         
         if current_user_id:
             # Add user-specific information
-            partner_id = self.get_partner_id(current_user_id)
-            user_response = self.get_user_response(current_user_id)
-            
-            data.update({
-                "partner_id": str(partner_id),
-                "your_response": user_response,
-                "is_fully_responded": self.is_fully_responded,
-            })
+            data["partner_id"] = str(self.get_partner_id(current_user_id))
+            data["your_response"] = self.get_user_response(current_user_id)
+            data["is_fully_responded"] = self.is_fully_responded
         else:
             # Include all user information
-            data.update({
-                "user1_id": str(self.user1_id),
-                "user2_id": str(self.user2_id),
-                "user1_response": self.user1_response,
-                "user2_response": self.user2_response,
-                "user1_responded_at": self.user1_responded_at.isoformat() if self.user1_responded_at else None,
-                "user2_responded_at": self.user2_responded_at.isoformat() if self.user2_responded_at else None,
-            })
+            user1_responded_at = self.user1_responded_at
+            user2_responded_at = self.user2_responded_at
+            data["user1_id"] = str(self.user1_id)
+            data["user2_id"] = str(self.user2_id)
+            data["user1_response"] = self.user1_response
+            data["user2_response"] = self.user2_response
+            data["user1_responded_at"] = _iso(user1_responded_at) if user1_responded_at else None
+            data["user2_responded_at"] = _iso(user2_responded_at) if user2_responded_at else None
         
-        if self.accepted_at:
-            data["accepted_at"] = self.accepted_at.isoformat()
-        if self.completed_at:
-            data["completed_at"] = self.completed_at.isoformat()
-        if self.session_id:
-            data["session_id"] = str(self.session_id)
-        if self.rejection_reason:
-            data["rejection_reason"] = self.rejection_reason
+        accepted_at = self.accepted_at
+        if accepted_at:
+            data["accepted_at"] = _iso(accepted_at)
+        completed_at = self.completed_at
+        if completed_at:
+            data["completed_at"] = _iso(completed_at)
+        session_id = self.session_id
+        if session_id:
+            data["session_id"] = str(session_id)
+        rejection_reason = self.rejection_reason
+        if rejection_reason:
+            data["rejection_reason"] = rejection_reason
         
         return data
+    
+    def to_summary_dict(self, current_user_id: Optional[uuid.UUID] = None, *, now: Optional[datetime] = None) -> Dict:
+        """Convert match to a list-view dictionary using only SUMMARY_COLUMNS"""
+        now = _now(now)
+        data = {
+            "id": str(self.id),
+            "state": self.state.name.lower(),
+            "match_score": self.match_score,
+            "proposed_at": _iso(self.proposed_at),
+            "expires_at": _iso(self.expires_at),
+            "is_expired": self.expired_at(now),
+            "is_pending": self.pending_at(now),
+        }
+        if current_user_id:
+            data["partner_id"] = str(self.get_partner_id(current_user_id))
+        else:
+            data["user1_id"] = str(self.user1_id)
+            data["user2_id"] = str(self.user2_id)
+        return data
+    
+    @classmethod
+    def bulk_to_dict(cls, matches: List["Match"], current_user_id: Optional[uuid.UUID] = None) -> List[Dict]:
+        """Serialize many matches against a single timestamp"""
+        now = _now()
+        return [match.to_dict(current_user_id, now=now) for match in matches]
 
 
 class MatchHistory(Base):
@@ -381,11 +637,11 @@ class MatchHistory(Base):
     match_id = Column(UUID(as_uuid=True), nullable=False, index=True)
     
     # Users involved
-    user1_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    user1_id = Column(UUID(as_uuid=True), nullable=False)  # Leftmost in ix_match_history_users
     user2_id = Column(UUID(as_uuid=True), nullable=False, index=True)
     
     # Match outcome
-    final_state = Column(SQLEnum(MatchState), nullable=False)
+    final_state = Column(IntEnumType(MatchState), nullable=False)
     match_score = Column(Float, nullable=False)
     response_time_seconds = Column(Integer, nullable=True)  # How long to respond
     
@@ -395,8 +651,8 @@ class MatchHistory(Base):
     session_quality_rating = Column(Float, nullable=True)  # Average of both user ratings
     
     # Analytics metadata
-    matching_factors = Column(JSON, nullable=False)
-    user_feedback = Column(JSON, nullable=True)  # Post-match feedback
+    matching_factors = Column(JSONB, nullable=False)
+    user_feedback = Column(JSONB, nullable=True)  # Post-match feedback
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -406,8 +662,80 @@ class MatchHistory(Base):
         Index('ix_match_history_users', 'user1_id', 'user2_id'),
         Index('ix_match_history_date', 'created_at'),
         Index('ix_match_history_outcome', 'final_state', 'session_completed'),
+        Index('ix_history_factors_gin', 'matching_factors', postgresql_using='gin'),
     )
     
     def __repr__(self):
         return f"<MatchHistory(id={self.id}, match_id={self.match_id}, state={self.final_state})>"
-    
\ No newline at end of file
+    
+    @classmethod
+    async def bulk_record(cls, session: AsyncSession, rows: List[Dict]) -> None:
+        """Insert many history rows as one executemany INSERT (e.g. once per worker tick)"""
+        if rows:
+            await session.execute(insert(cls), rows)
+    
+    @classmethod
+    async def copy_records(cls, session: AsyncSession, rows: Iterable[Dict]) -> int:
+        """Bulk-load history rows with binary COPY; for analytics backfills on asyncpg
+        
+        Bypasses ORM defaults and events; created_at falls back to the server default.
+        """
+        records = [
+            (
+                row.get("id") or uuid.uuid4(),
+                row["match_id"],
+                row["user1_id"],
+                row["user2_id"],
+                int(row["final_state"]),
+                row["match_score"],
+                row.get("response_time_seconds"),
+                row.get("session_completed", False),
+                row.get("session_duration_minutes"),
+                row.get("session_quality_rating"),
+                json.dumps(row["matching_factors"]),
+                json.dumps(row["user_feedback"]) if row.get("user_feedback") is not None else None,
+            )
+            for row in rows
+        ]
+        if not records:
+            return 0
+        
+        connection = await session.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            cls.__tablename__, records=records, columns=_HISTORY_COPY_COLUMNS
+        )
+        return len(records)
+
+
+# Column order of the records built by MatchHistory.copy_records
+_HISTORY_COPY_COLUMNS = (
+    "id", "match_id", "user1_id", "user2_id", "final_state", "match_score",
+    "response_time_seconds", "session_completed", "session_duration_minutes",
+    "session_quality_rating", "matching_factors", "user_feedback",
+)
+    
+
+
+class MatchRow(NamedTuple):
+    """Read-only match view for exports; no identity map or change tracking"""
+    id: uuid.UUID
+    user1_id: uuid.UUID
+    user2_id: uuid.UUID
+    state: MatchState
+    match_score: float
+    proposed_at: datetime
+    expires_at: datetime
+    completed_at: Optional[datetime]
+
+
+async def stream_matches(session: AsyncSession, batch_size: int = 1000, **filters) -> AsyncIterator[MatchRow]:
+    """Stream matches as MatchRow tuples with a server-side cursor, batch_size rows at a time"""
+    stmt = (
+        select(*(getattr(Match, field) for field in MatchRow._fields))
+        .filter_by(**filters)
+        .execution_options(yield_per=batch_size)
+    )
+    result = await session.stream(stmt)
+    async for row in result:
+        yield MatchRow._make(row)
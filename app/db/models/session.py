@@ -1,13 +1,19 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, JSON, Enum as SQLEnum, ForeignKey, Index
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, Enum as SQLEnum, ForeignKey, Index, update, bindparam, event, select, or_, literal, insert, case, and_, cast
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, selectinload, raiseload, validates, load_only
+from sqlalchemy.orm.attributes import set_committed_value
+import asyncio
+import time
 import uuid
 import enum
-from datetime import datetime, timedelta
-from typing import Dict, Optional, List
+from datetime import timedelta
+from typing import Dict, Mapping, Optional, List
+from loguru import logger
 
-from app.db.base import Base
+from app.db.base import Base, ParticipantSlotsMixin
+from app.utils.clock import now_utc
 
 
 class SessionState(enum.Enum):
@@ -36,8 +42,46 @@ class SessionEndReason(enum.Enum):
     MAXIMUM_DURATION = "maximum_duration"  # Hit time limit
 
 
-class Session(Base):
-    """Chat session between matched users"""
+_ENDED_STATES = frozenset({SessionState.ENDED, SessionState.DROPPED, SessionState.EXPIRED})
+
+# Columns loaded by Session.load_for_ws
+_WS_COLUMNS = (
+    "state", "is_ended_flag", "current_turn_language", "user1_id", "user2_id",
+    "user1_typing", "user2_typing", "last_activity_at",
+)
+
+# State a session ends in for each end reason; anything else is DROPPED
+_END_STATE_BY_REASON = {
+    SessionEndReason.COMPLETED: SessionState.ENDED,
+    SessionEndReason.MAXIMUM_DURATION: SessionState.EXPIRED,
+}
+
+# Enum member -> serialized value, so to_dict indexes a dict instead of calling .value
+_STATE_VALUES = {state: state.value for state in SessionState}
+_TURN_VALUES = {turn: turn.value for turn in TurnLanguage}
+_END_REASON_VALUES = {reason: reason.value for reason in SessionEndReason}
+
+
+# High-frequency session fields that may live in Redis (app.db.cache) between flushes.
+# Counters are stored as deltas; values overwrite the column when present.
+HOT_COUNTER_FIELDS = ("total_messages", "user1_message_count", "user2_message_count")
+HOT_VALUE_FIELDS = ("last_activity_at", "user1_last_seen", "user2_last_seen", "user1_typing", "user2_typing")
+
+# Per-participant column names, keyed by slot (1 = user1, 2 = user2)
+_SLOT_LAST_SEEN = {1: "user1_last_seen", 2: "user2_last_seen"}
+_SLOT_TYPING = {1: "user1_typing", 2: "user2_typing"}
+_SLOT_MESSAGE_COUNT = {1: "user1_message_count", 2: "user2_message_count"}
+
+
+class Session(ParticipantSlotsMixin, Base):
+    """Chat session between matched users
+    
+    Load sessions by primary key with Session.get (db.get), never a
+    select()/filter on id: repeat lookups within one AsyncSession are then
+    served from the identity map without another SELECT. Pass the loaded
+    instance down to to_dict/end_session/update_activity rather than
+    re-fetching it.
+    """
     __tablename__ = "sessions"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
@@ -56,11 +100,13 @@ class Session(Base):
     room_id = Column(String(100), nullable=False, unique=True, index=True)
     
     # Session configuration
-    languages = Column(JSON, nullable=False)  # {"primary": "ja", "secondary": "en", "user1_native": "en", "user2_native": "ja"}
+    languages = Column(JSONB, nullable=False)  # {"primary": "ja", "secondary": "en", "user1_native": "en", "user2_native": "ja"}
     planned_duration_minutes = Column(Integer, default=25, nullable=False)
     
     # Current session state
     state = Column(SQLEnum(SessionState), default=SessionState.ACTIVE, nullable=False, index=True)
+    # Denormalized "state in _ENDED_STATES"; kept in sync by _track_ended (ending is one-way)
+    is_ended_flag = Column(Boolean, default=False, nullable=False)
     current_turn_language = Column(SQLEnum(TurnLanguage), default=TurnLanguage.USER1_NATIVE, nullable=False)
     
     # Language turn management
@@ -71,7 +117,7 @@ class Session(Base):
     # Guided conversation
     prompt_pack_id = Column(UUID(as_uuid=True), nullable=True, index=True)
     current_prompt_index = Column(Integer, default=0, nullable=False)
-    prompts_used = Column(JSON, nullable=False, default=[])  # List of used prompt IDs
+    prompts_used = Column(JSONB, nullable=False, default=[])  # List of used prompt IDs
     
     # Session timeline
     started_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -96,7 +142,9 @@ class Session(Base):
     
     # Session quality and moderation
     toxicity_warnings = Column(Integer, default=0, nullable=False)
-    moderation_flags = Column(JSON, nullable=False, default=[])  # List of moderation events
+    # Moderation events live in session_moderation_flags (see SessionModerationFlag)
+    moderation_flags = relationship("SessionModerationFlag", lazy="write_only",
+                                    cascade="all, delete-orphan", passive_deletes=True)
     
     # Session completion
     end_reason = Column(SQLEnum(SessionEndReason), nullable=True)
@@ -108,16 +156,26 @@ class Session(Base):
     
     # Relationships
     # match = relationship("Match", back_populates="session")
-    # messages = relationship("Message", back_populates="session", cascade="all, delete-orphan")
-    # user1 = relationship("User", foreign_keys=[user1_id])
-    # user2 = relationship("User", foreign_keys=[user2_id])
+    # Once Message exists: lazy="raise"; callers opt in with selectinload(Session.messages)
+    # messages = relationship("Message", back_populates="session", lazy="raise", cascade="all, delete-orphan")
+    # Partners are almost always needed, so load them with one IN (...) query per result set
+    user1 = relationship("User", foreign_keys=[user1_id], lazy="selectin")
+    user2 = relationship("User", foreign_keys=[user2_id], lazy="selectin")
     
     # Indexes for performance
     __table_args__ = (
         Index('ix_session_users', 'user1_id', 'user2_id'),
         Index('ix_session_state_activity', 'state', 'last_activity_at'),
+        # Idle sweeper (idle_sweep_query): active sessions only, range-scanned on last activity
+        Index('ix_session_active_idle', last_activity_at, postgresql_where=state == SessionState.ACTIVE),
+        # Live sessions per participant (active_for_user); ended sessions stay out of the index
+        Index('ix_session_live_user1', user1_id, postgresql_where=~is_ended_flag),
+        Index('ix_session_live_user2', user2_id, postgresql_where=~is_ended_flag),
         Index('ix_session_started_at', 'started_at'),
         Index('ix_session_room_id', 'room_id'),
+        # Containment lookups on the language config (languages_contain)
+        Index('ix_session_languages_gin', 'languages', postgresql_using='gin',
+              postgresql_ops={'languages': 'jsonb_path_ops'}),
     )
     
     def __repr__(self):
@@ -131,7 +189,7 @@ class Session(Base):
     @property
     def is_ended(self) -> bool:
         """Check if session has ended"""
-        return self.state in [SessionState.ENDED, SessionState.DROPPED, SessionState.EXPIRED]
+        return bool(self.is_ended_flag)
     
     @property
     def duration_minutes(self) -> float:
@@ -144,7 +202,7 @@ class Session(Base):
         if self.is_ended:
             return False
         
-        elapsed = datetime.utcnow() - self.started_at
+        elapsed = now_utc() - self.started_at
         return elapsed.total_seconds() > (self.planned_duration_minutes * 60)
     
     @property
@@ -153,7 +211,7 @@ class Session(Base):
         if self.is_ended:
             return 0.0
         
-        elapsed = datetime.utcnow() - self.started_at
+        elapsed = now_utc() - self.started_at
         elapsed_minutes = elapsed.total_seconds() / 60.0
         return max(0.0, self.planned_duration_minutes - elapsed_minutes)
     
@@ -164,54 +222,97 @@ class Session(Base):
             return False
         
         idle_threshold = timedelta(minutes=15)  # From settings.SESSION_IDLE_TIMEOUT_MINUTES
-        return datetime.utcnow() - self.last_activity_at > idle_threshold
+        return now_utc() - self.last_activity_at > idle_threshold
+    
+    @validates("state")
+    def _track_ended(self, key, value):
+        if value in _ENDED_STATES:
+            self.is_ended_flag = True
+        return value
+    
+    @classmethod
+    def languages_contain(cls, **languages: str):
+        """SQL predicate, e.g. languages_contain(primary="ja"); @> is served by the GIN index"""
+        return cls.languages.contains(languages)
+    
+    @classmethod
+    def idle_sweep_query(cls, idle_minutes: int = 15):
+        """IDs of active sessions idle for idle_minutes (served by ix_session_active_idle)"""
+        return (
+            select(cls.id)
+            .where(
+                # Inline the state so cached/prepared plans still match the partial index predicate
+                cls.state == literal(SessionState.ACTIVE, cls.state.type, literal_execute=True),
+                cls.last_activity_at < func.now() - timedelta(minutes=idle_minutes)
+            )
+        )
     
     def get_partner_id(self, user_id: uuid.UUID) -> uuid.UUID:
         """Get partner's user ID"""
-        if user_id == self.user1_id:
-            return self.user2_id
-        elif user_id == self.user2_id:
-            return self.user1_id
-        else:
+        slot = self._slot_for(user_id)
+        if slot is None:
             raise ValueError("User ID not found in this session")
+        return self.user2_id if slot == 1 else self.user1_id
     
     def is_participant(self, user_id: uuid.UUID) -> bool:
         """Check if user is a participant in this session"""
-        return user_id in [self.user1_id, self.user2_id]
+        return user_id in self._slots
     
-    def update_activity(self, user_id: Optional[uuid.UUID] = None):
-        """Update last activity timestamp"""
-        now = datetime.utcnow()
-        self.last_activity_at = now
+    def update_activity(self, user_id: Optional[uuid.UUID] = None, *,
+                        batcher: Optional["SessionUpdateBatcher"] = None):
+        """Update last activity timestamp (hot paths: app.db.cache.session_state_cache)"""
+        now = now_utc()
+        values = {"last_activity_at": now}
         
-        if user_id:
-            if user_id == self.user1_id:
-                self.user1_last_seen = now
-            elif user_id == self.user2_id:
-                self.user2_last_seen = now
-    
-    def increment_message_count(self, user_id: uuid.UUID):
-        """Increment message count for user"""
-        self.total_messages += 1
+        slot = self._slot_for(user_id)
+        if slot is not None:
+            values[_SLOT_LAST_SEEN[slot]] = now
+        
+        self._apply_hot_update(values, {}, batcher)
+    
+    def increment_message_count(self, user_id: uuid.UUID, *,
+                                batcher: Optional["SessionUpdateBatcher"] = None):
+        """Increment message count for user (hot paths: app.db.cache.session_state_cache)"""
+        deltas = {"total_messages": 1}
         
-        if user_id == self.user1_id:
-            self.user1_message_count += 1
-        elif user_id == self.user2_id:
-            self.user2_message_count += 1
-    
-    def set_typing_status(self, user_id: uuid.UUID, is_typing: bool):
-        """Set typing status for user"""
-        if user_id == self.user1_id:
-            self.user1_typing = is_typing
-        elif user_id == self.user2_id:
-            self.user2_typing = is_typing
+        slot = self._slot_for(user_id)
+        if slot is not None:
+            deltas[_SLOT_MESSAGE_COUNT[slot]] = 1
+        
+        self._apply_hot_update({}, deltas, batcher)
+    
+    def set_typing_status(self, user_id: uuid.UUID, is_typing: bool, *,
+                          batcher: Optional["SessionUpdateBatcher"] = None):
+        """Set typing status for user (hot paths: app.db.cache.session_state_cache)"""
+        slot = self._slot_for(user_id)
+        if slot is not None:
+            self._apply_hot_update({_SLOT_TYPING[slot]: is_typing}, {}, batcher)
         
         if is_typing:
-            self.update_activity(user_id)
+            self.update_activity(user_id, batcher=batcher)
+    
+    def _apply_hot_update(self, values: Dict, deltas: Dict[str, int],
+                          batcher: Optional["SessionUpdateBatcher"]):
+        """Apply hot-field changes; with a batcher, record them there instead of dirtying the row"""
+        if batcher is None:
+            for field, value in values.items():
+                setattr(self, field, value)
+            for field, delta in deltas.items():
+                setattr(self, field, getattr(self, field) + delta)
+            return
+        
+        # Keep the instance current without scheduling an ORM UPDATE; the batcher writes it
+        for field, value in values.items():
+            set_committed_value(self, field, value)
+        for field, delta in deltas.items():
+            set_committed_value(self, field, getattr(self, field) + delta)
+        batcher.record(self.id, **values, **deltas)
+        if deltas:
+            self._invalidate_stats()  # set_committed_value bypasses the attribute events
     
     def switch_turn_language(self) -> TurnLanguage:
         """Switch the current turn language"""
-        now = datetime.utcnow()
+        now = now_utc()
         
         if self.current_turn_language == TurnLanguage.USER1_NATIVE:
             self.current_turn_language = TurnLanguage.USER2_NATIVE
@@ -233,12 +334,12 @@ class Session(Base):
         
         # Suggest switch every 10 minutes (from settings.SESSION_TURN_SWITCH_MINUTES)
         switch_interval = timedelta(minutes=10)
-        return datetime.utcnow() - self.turn_switched_at > switch_interval
+        return now_utc() - self.turn_switched_at > switch_interval
     
     def pause_session(self, reason: str = "disconnection"):
         """Pause the session"""
         if self.state == SessionState.ACTIVE:
-            now = datetime.utcnow()
+            now = now_utc()
             
             # Update active duration
             if self.paused_at is None:
@@ -251,7 +352,7 @@ class Session(Base):
     def resume_session(self):
         """Resume a paused session"""
         if self.state == SessionState.PAUSED and self.paused_at:
-            now = datetime.utcnow()
+            now = now_utc()
             
             # Update paused duration
             paused_time = now - self.paused_at
@@ -266,7 +367,7 @@ class Session(Base):
         if self.is_ended:
             return
         
-        now = datetime.utcnow()
+        now = now_utc()
         
         # Calculate final active duration
         if self.state == SessionState.ACTIVE:
@@ -277,12 +378,7 @@ class Session(Base):
             self.paused_duration_seconds += int(paused_time.total_seconds())
         
         # Set end state
-        if reason == SessionEndReason.COMPLETED:
-            self.state = SessionState.ENDED
-        elif reason == SessionEndReason.MAXIMUM_DURATION:
-            self.state = SessionState.EXPIRED
-        else:
-            self.state = SessionState.DROPPED
+        self.state = _END_STATE_BY_REASON.get(reason, SessionState.DROPPED)
         
         self.ended_at = now
         self.end_reason = reason
@@ -292,17 +388,125 @@ class Session(Base):
         self.user1_typing = False
         self.user2_typing = False
     
-    def add_moderation_flag(self, flag_type: str, details: Dict):
-        """Add moderation flag to session"""
-        if self.moderation_flags is None:
-            self.moderation_flags = []
+    def apply_hot_state(self, state: Mapping):
+        """Fold buffered hot state (counter deltas and latest values) into this instance"""
+        for field in HOT_COUNTER_FIELDS:
+            delta = state.get(field)
+            if delta:
+                setattr(self, field, getattr(self, field) + delta)
+        for field in HOT_VALUE_FIELDS:
+            value = state.get(field)
+            if value is not None:
+                setattr(self, field, value)
+    
+    @classmethod
+    async def write_hot_state(cls, db: AsyncSession, states: Mapping[uuid.UUID, Mapping]) -> None:
+        """Persist buffered hot state for many sessions in one executemany UPDATE"""
+        rows = [
+            {
+                "b_id": session_id,
+                **{f"b_{field}": state.get(field) or 0 for field in HOT_COUNTER_FIELDS},
+                **{f"b_{field}": state.get(field) for field in HOT_VALUE_FIELDS},
+            }
+            for session_id, state in states.items()
+        ]
+        if rows:
+            await db.execute(_HOT_STATE_UPDATE, rows)
+    
+    @classmethod
+    async def end_session_bulk(cls, db: AsyncSession, rows: List[Dict]) -> None:
+        """End many sessions with one executemany UPDATE; the set-based end_session
         
-        flag = {
-            "type": flag_type,
-            "timestamp": datetime.utcnow().isoformat(),
-            "details": details
-        }
-        self.moderation_flags.append(flag)
+        Each row is {"session_id", "reason", optional "ended_by_user_id"}. Duration
+        bookkeeping happens in SQL from each row's current state; sessions that have
+        already ended are left alone. Loaded instances are not refreshed, and Redis
+        hot state should be popped first (see app.db.cache).
+        """
+        if not rows:
+            return
+        now = now_utc()
+        params = [
+            {
+                "b_id": row["session_id"],
+                "b_state": _END_STATE_BY_REASON.get(row["reason"], SessionState.DROPPED),
+                "b_end_reason": row["reason"],
+                "b_ended_by_user_id": row.get("ended_by_user_id"),
+                "b_ended_at": now,
+            }
+            for row in rows
+        ]
+        await db.execute(_END_SESSION_UPDATE, params)
+    
+    @classmethod
+    async def get(cls, db: AsyncSession, session_id: uuid.UUID) -> Optional["Session"]:
+        """Load a session by ID, reusing the identity map when already loaded"""
+        return await db.get(cls, session_id)
+    
+    @classmethod
+    async def bulk_create(cls, db: AsyncSession, rows: List[Dict]) -> List[uuid.UUID]:
+        """Insert many sessions as one executemany INSERT, bypassing the identity map
+        
+        IDs are assigned here, so no RETURNING round trip is needed; they come
+        back in the order of rows. Column defaults still apply.
+        """
+        if not rows:
+            return []
+        rows = [{**row, "id": row.get("id") or uuid.uuid4()} for row in rows]
+        await db.execute(insert(cls), rows)
+        return [row["id"] for row in rows]
+    
+    @classmethod
+    async def load_for_ws(cls, db: AsyncSession, session_id: uuid.UUID) -> Optional["Session"]:
+        """Load just the columns WebSocket handlers read, without participants
+        
+        Any other column is unloaded, and touching it would lazy-load (an error
+        under AsyncSession); use Session.get for full instances.
+        """
+        stmt = (
+            select(cls)
+            .options(load_only(*(getattr(cls, name) for name in _WS_COLUMNS)), raiseload("*"))
+            .where(cls.id == session_id)
+        )
+        result = await db.execute(stmt)
+        return result.scalar_one_or_none()
+    
+    @classmethod
+    async def list_for_user(cls, db: AsyncSession, user_id: uuid.UUID,
+                            limit: int = 50, offset: int = 0) -> List["Session"]:
+        """A page of a user's sessions, newest first, with both participants loaded
+        
+        Every other relationship raises on access instead of lazy-loading per row.
+        """
+        stmt = (
+            select(cls)
+            .options(selectinload(cls.user1), selectinload(cls.user2), raiseload("*"))
+            .where(or_(cls.user1_id == user_id, cls.user2_id == user_id))
+            .order_by(cls.started_at.desc())
+            .limit(limit)
+            .offset(offset)
+        )
+        result = await db.scalars(stmt)
+        return list(result)
+    
+    @classmethod
+    async def active_for_user(cls, db: AsyncSession, user_id: uuid.UUID) -> Optional["Session"]:
+        """The user's live (not ended) session, if any; served by the ix_session_live_* indexes"""
+        stmt = (
+            select(cls)
+            .where(or_(cls.user1_id == user_id, cls.user2_id == user_id), ~cls.is_ended_flag)
+            .order_by(cls.started_at.desc())
+            .limit(1)
+        )
+        result = await db.scalars(stmt)
+        return result.first()
+    
+    def add_moderation_flag(self, flag_type: str, details: Dict):
+        """Add moderation flag to session (a single-row INSERT on flush)"""
+        self.moderation_flags.add(SessionModerationFlag(
+            flag_type=flag_type,
+            flagged_at=now_utc(),
+            details=details
+        ))
         
         if flag_type in ["toxicity", "inappropriate_content"]:
             self.toxicity_warnings += 1
@@ -330,7 +534,16 @@ class Session(Base):
             self.current_prompt_index += 1
     
     def get_session_stats(self) -> Dict:
-        """Get session statistics"""
+        """Get session statistics (memoized until a stats field changes; treat as read-only)"""
+        stats = self.__dict__.get("_stats_cache")
+        if stats is None:
+            stats = self.__dict__["_stats_cache"] = self._build_session_stats()
+        return stats
+    
+    def _invalidate_stats(self):
+        self.__dict__.pop("_stats_cache", None)
+    
+    def _build_session_stats(self) -> Dict:
         return {
             "total_messages": self.total_messages,
             "user1_messages": self.user1_message_count,
@@ -345,26 +558,69 @@ class Session(Base):
     
     def to_dict(self, current_user_id: Optional[uuid.UUID] = None) -> Dict:
         """Convert session to dictionary"""
+        if self.is_ended_flag:
+            data = self._to_dict_ended()
+        else:
+            data = self._to_dict_live()
+        
+        self._add_participant_fields(data, current_user_id)
+        
+        if self.turn_switched_at:
+            data["turn_switched_at"] = self.turn_switched_at.isoformat()
+        if self.current_prompt_index is not None:
+            data["current_prompt"] = self.get_current_prompt()
+        
+        return data
+    
+    def _to_dict_live(self) -> Dict:
+        """to_dict fields for ACTIVE/PAUSED sessions; these never carry end details"""
+        elapsed_minutes = (now_utc() - self.started_at).total_seconds() / 60.0
+        return {
+            "id": str(self.id),
+            "room_id": self.room_id,
+            "state": _STATE_VALUES[self.state],
+            "languages": self.languages,
+            "current_turn_language": _TURN_VALUES[self.current_turn_language],
+            "planned_duration_minutes": self.planned_duration_minutes,
+            "started_at": self.started_at.isoformat(),
+            "last_activity_at": self.last_activity_at.isoformat() if self.last_activity_at else None,
+            "stats": self.get_session_stats(),
+            "is_active": self.state is SessionState.ACTIVE,
+            "is_ended": False,
+            "time_remaining_minutes": max(0.0, self.planned_duration_minutes - elapsed_minutes),
+            "should_suggest_turn_switch": self.should_suggest_turn_switch(),
+        }
+    
+    def _to_dict_ended(self) -> Dict:
+        """to_dict fields for ENDED/DROPPED/EXPIRED sessions"""
         data = {
             "id": str(self.id),
             "room_id": self.room_id,
-            "state": self.state.value,
+            "state": _STATE_VALUES[self.state],
             "languages": self.languages,
-            "current_turn_language": self.current_turn_language.value,
+            "current_turn_language": _TURN_VALUES[self.current_turn_language],
             "planned_duration_minutes": self.planned_duration_minutes,
             "started_at": self.started_at.isoformat(),
             "last_activity_at": self.last_activity_at.isoformat() if self.last_activity_at else None,
             "stats": self.get_session_stats(),
-            "is_active": self.is_active,
-            "is_ended": self.is_ended,
-            "time_remaining_minutes": self.time_remaining_minutes,
+            "is_active": False,
+            "is_ended": True,
+            "time_remaining_minutes": 0.0,
             "should_suggest_turn_switch": self.should_suggest_turn_switch(),
         }
-        
+        if self.ended_at:
+            data["ended_at"] = self.ended_at.isoformat()
+        if self.end_reason:
+            data["end_reason"] = _END_REASON_VALUES[self.end_reason]
+        if self.ended_by_user_id:
+            data["ended_by_user_id"] = str(self.ended_by_user_id)
+        return data
+    
+    def _add_participant_fields(self, data: Dict, current_user_id: Optional[uuid.UUID]):
         if current_user_id:
             # Add user-specific information
             partner_id = self.get_partner_id(current_user_id)
-            is_user1 = current_user_id == self.user1_id
+            is_user1 = self._slot_for(current_user_id) == 1
             
             data.update({
                 "partner_id": str(partner_id),
@@ -384,19 +640,195 @@ class Session(Base):
                 "user1_last_seen": self.user1_last_seen.isoformat() if self.user1_last_seen else None,
                 "user2_last_seen": self.user2_last_seen.isoformat() if self.user2_last_seen else None,
             })
+
+# Columns read by Session.get_session_stats; any change drops the memoized stats
+_STATS_FIELDS = (
+    "total_messages", "user1_message_count", "user2_message_count", "active_duration_seconds",
+    "paused_duration_seconds", "turn_switch_count", "toxicity_warnings", "prompts_used",
+)
+
+
+def _drop_stats_cache(target, *args):
+    target._invalidate_stats()
+
+
+for _field in _STATS_FIELDS:
+    event.listen(getattr(Session, _field), "set", _drop_stats_cache)
+event.listen(Session, "refresh", _drop_stats_cache)
+event.listen(Session, "expire", _drop_stats_cache)
+
+
+_sessions = Session.__table__
+
+# Counters add their delta; values are kept when the buffered value is NULL
+_HOT_STATE_UPDATE = (
+    update(_sessions)
+    .where(_sessions.c.id == bindparam("b_id"))
+    .values(
+        **{field: _sessions.c[field] + bindparam(f"b_{field}") for field in HOT_COUNTER_FIELDS},
+        **{
+            field: func.coalesce(bindparam(f"b_{field}", type_=_sessions.c[field].type), _sessions.c[field])
+            for field in HOT_VALUE_FIELDS
+        },
+    )
+)
+
+
+
+_END_AT = bindparam("b_ended_at", type_=DateTime(timezone=True))
+
+
+def _elapsed_seconds(since):
+    """Whole seconds from since to the batch's end time, truncated like int(timedelta.total_seconds())"""
+    return cast(func.floor(func.extract("epoch", _END_AT - since)), Integer)
+
+# Mirrors Session.end_session; SET expressions read the row's pre-update state
+_END_SESSION_UPDATE = (
+    update(_sessions)
+    .where(_sessions.c.id == bindparam("b_id"), _sessions.c.is_ended_flag.is_(False))
+    .values(
+        active_duration_seconds=_sessions.c.active_duration_seconds + case(
+            (_sessions.c.state == SessionState.ACTIVE,
+             _elapsed_seconds(func.coalesce(_sessions.c.paused_at, _sessions.c.started_at))),
+            else_=0,
+        ),
+        paused_duration_seconds=_sessions.c.paused_duration_seconds + case(
+            (and_(_sessions.c.state == SessionState.PAUSED, _sessions.c.paused_at.isnot(None)),
+             _elapsed_seconds(_sessions.c.paused_at)),
+            else_=0,
+        ),
+        state=bindparam("b_state", type_=_sessions.c.state.type),
+        ended_at=_END_AT,
+        end_reason=bindparam("b_end_reason", type_=_sessions.c.end_reason.type),
+        ended_by_user_id=bindparam("b_ended_by_user_id", type_=_sessions.c.ended_by_user_id.type),
+        user1_typing=False,
+        user2_typing=False,
+        is_ended_flag=True,
+    )
+)
+
+
+class SessionModerationFlag(Base):
+    """Moderation event raised during a session"""
+    __tablename__ = "session_moderation_flags"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False)
+    flag_type = Column(String(50), nullable=False)
+    flagged_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    details = Column(JSONB, nullable=False, default={})
+    
+    __table_args__ = (
+        Index('ix_session_moderation_flags_session_time', 'session_id', 'flagged_at'),
+    )
+    
+    def __repr__(self):
+        return f"<SessionModerationFlag(id={self.id}, session_id={self.session_id}, type={self.flag_type})>"
+    
+    @classmethod
+    async def counts_for_session(cls, db: AsyncSession, session_id: uuid.UUID) -> Dict[str, int]:
+        """Flag totals for a session, aggregated in SQL"""
+        stmt = select(
+            func.count().label("total"),
+            func.count().filter(cls.flag_type == "toxicity").label("toxicity"),
+            func.count().filter(cls.flag_type == "inappropriate_content").label("inappropriate_content"),
+        ).where(cls.session_id == session_id)
+        result = await db.execute(stmt)
+        return dict(result.one()._mapping)
+    
+    def to_dict(self) -> Dict:
+        return {
+            "type": self.flag_type,
+            "timestamp": self.flagged_at.isoformat(),
+            "details": self.details,
+        }
+
+
+class SessionUpdateBatcher:
+    """In-process buffer for hot session updates, written as one executemany UPDATE
+    
+    Pass it as batcher= to update_activity / increment_message_count / set_typing_status.
+    Counter fields accumulate deltas, other fields keep the latest value. run() flushes
+    once max_latency_seconds have passed since the oldest buffered update, or sooner when
+    max_events updates are pending.
+    """
+    
+    def __init__(self, max_latency_seconds: float = 2.0, max_events: int = 1000):
+        self.max_latency_seconds = max_latency_seconds
+        self.max_events = max_events
+        self._pending: Dict[uuid.UUID, Dict] = {}
+        self._events = 0
+        self._oldest_at: Optional[float] = None
+    
+    def record(self, session_id: uuid.UUID, **fields):
+        """Buffer hot-field changes for one session"""
+        state = self._pending.setdefault(session_id, {})
+        for field, value in fields.items():
+            if field in HOT_COUNTER_FIELDS:
+                state[field] = state.get(field, 0) + value
+            else:
+                state[field] = value
         
-        if self.ended_at:
-            data["ended_at"] = self.ended_at.isoformat()
-        if self.end_reason:
-            data["end_reason"] = self.end_reason.value
-        if self.ended_by_user_id:
-            data["ended_by_user_id"] = str(self.ended_by_user_id)
-        if self.turn_switched_at:
-            data["turn_switched_at"] = self.turn_switched_at.isoformat()
-        if self.current_prompt_index is not None:
-            data["current_prompt"] = self.get_current_prompt()
+        self._events += 1
+        if self._oldest_at is None:
+            self._oldest_at = time.monotonic()
+    
+    @property
+    def is_due(self) -> bool:
+        """Whether buffered updates have reached the latency or size bound"""
+        if self._oldest_at is None:
+            return False
+        return (
+            self._events >= self.max_events or
+            time.monotonic() - self._oldest_at >= self.max_latency_seconds
+        )
+    
+    async def flush(self, db: AsyncSession) -> int:
+        """Write all buffered updates and commit; returns the number of sessions written"""
+        pending, self._pending = self._pending, {}
+        self._events, self._oldest_at = 0, None
+        if not pending:
+            return 0
         
-        return data
+        try:
+            await Session.write_hot_state(db, pending)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            self._requeue(pending)
+            raise
+        
+        return len(pending)
+    
+    def _requeue(self, pending: Mapping[uuid.UUID, Mapping]):
+        """Merge a failed batch back without overwriting newer values"""
+        for session_id, state in pending.items():
+            current = self._pending.setdefault(session_id, {})
+            for field, value in state.items():
+                if field in HOT_COUNTER_FIELDS:
+                    current[field] = current.get(field, 0) + value
+                else:
+                    current.setdefault(field, value)
+        if self._pending and self._oldest_at is None:
+            self._oldest_at = time.monotonic()
+    
+    async def run(self, session_factory, poll_seconds: float = 0.25):
+        """Flush whenever due until cancelled (started from the app lifespan)"""
+        while True:
+            await asyncio.sleep(poll_seconds)
+            if not self.is_due:
+                continue
+            try:
+                async with session_factory() as db:
+                    await self.flush(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Session update batch flush failed: {}", e)
+
+
+# Shared batcher instance
+session_update_batcher = SessionUpdateBatcher()
 
 
 class SessionMetrics(Base):
@@ -407,15 +839,13 @@ class SessionMetrics(Base):
     session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id", ondelete="CASCADE"), 
                         nullable=False, unique=True, index=True)
     
-    # Engagement metrics
-    message_response_times = Column(JSON, nullable=False, default=[])  # List of response times in seconds
-    silence_periods = Column(JSON, nullable=False, default=[])  # List of silence durations
-    typing_patterns = Column(JSON, nullable=False, default={})  # Typing behavior analysis
+    # Engagement metrics (response times and silences live in session_event_timings)
+    typing_patterns = Column(JSONB, nullable=False, default={})  # Typing behavior analysis
     
     # Language learning metrics
-    vocabulary_encounters = Column(JSON, nullable=False, default=[])  # New words encountered
-    correction_instances = Column(JSON, nullable=False, default=[])  # Language corrections made
-    translation_requests = Column(JSON, nullable=False, default=[])  # Translation assistance used
+    vocabulary_encounters = Column(JSONB, nullable=False, default=[])  # New words encountered
+    correction_instances = Column(JSONB, nullable=False, default=[])  # Language corrections made
+    translation_requests = Column(JSONB, nullable=False, default=[])  # Translation assistance used
     
     # Quality metrics
     conversation_flow_score = Column(Float, nullable=True)  # 0-1 score of conversation quality
@@ -431,4 +861,43 @@ class SessionMetrics(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
     def __repr__(self):
-        return f"<SessionMetrics(id={self.id}, session_id={self.session_id})>"
\ No newline at end of file
+        return f"<SessionMetrics(id={self.id}, session_id={self.session_id})>"
+    
+    async def timing_stats(self, db: AsyncSession, kind: str) -> Dict[str, Optional[float]]:
+        """Timing stats for this metrics row's session (see SessionEventTiming.stats)"""
+        return await SessionEventTiming.stats(db, self.session_id, kind)
+
+
+class SessionEventTiming(Base):
+    """One measured duration during a session, e.g. a reply time or a silence"""
+    __tablename__ = "session_event_timings"
+    
+    RESPONSE = "response"
+    SILENCE = "silence"
+    
+    # recorded_at is part of the key so the table can be a TimescaleDB hypertable (app.db.analytics)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(String(20), nullable=False)
+    seconds = Column(Float, nullable=False)
+    recorded_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+    
+    __table_args__ = (
+        Index('ix_session_event_timings_session_kind', 'session_id', 'kind'),
+    )
+    
+    def __repr__(self):
+        return f"<SessionEventTiming(session_id={self.session_id}, kind={self.kind}, seconds={self.seconds})>"
+    
+    @classmethod
+    async def stats(cls, db: AsyncSession, session_id: uuid.UUID, kind: str) -> Dict[str, Optional[float]]:
+        """Count, mean, min, max and p95 of one kind of timing for a session, aggregated in Postgres"""
+        stmt = select(
+            func.count().label("count"),
+            func.avg(cls.seconds).label("avg"),
+            func.min(cls.seconds).label("min"),
+            func.max(cls.seconds).label("max"),
+            func.percentile_cont(0.95).within_group(cls.seconds).label("p95"),
+        ).where(cls.session_id == session_id, cls.kind == kind)
+        row = (await db.execute(stmt)).one()
+        return dict(row._mapping)
@@ -1,11 +1,16 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, JSON, Enum as SQLEnum, UniqueConstraint, Index
-from sqlalchemy.dialects.postgresql import UUID, ARRAY
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Enum as SQLEnum, ForeignKey, UniqueConstraint, Index, Computed, DDL, event, select, or_, and_, case, cast, literal_column, literal, exists, insert, delete, update, inspect
+from sqlalchemy.dialects.postgresql import UUID, ARRAY, JSONB, aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import validates, deferred, column_property, undefer_group
+from sqlalchemy.ext.hybrid import hybrid_property
+import bisect
+import math
+from operator import attrgetter
 import uuid
 import enum
-from datetime import datetime
-from typing import List, Dict, Optional
+from functools import cached_property
+from typing import Dict, FrozenSet, Iterable, List, Optional
 
 from app.db.base import Base
 
@@ -48,6 +53,37 @@ class CEFRLevel(enum.Enum):
     NATIVE = "NATIVE"  # Native speaker
 
 
+class LanguageKind(enum.Enum):
+    """How a user relates to a language in user_languages"""
+    NATIVE = "native"
+    TARGET = "target"
+
+
+def _matchable_predicate(is_active, is_banned, onboard_state):
+    """Account-status part of User.can_match; shared by the hybrid and ix_user_matchable"""
+    # Inline the state so prepared/generic plans still match the partial index
+    completed = literal(OnboardingState.COMPLETED, onboard_state.type, literal_execute=True)
+    return and_(is_active, ~is_banned, onboard_state == completed)
+
+
+def _enum_value_expr(column, enum_class):
+    """SQL expression mapping a native enum column (stored by name) to the member's value"""
+    return case(*((column == member, member.value) for member in enum_class))
+
+
+# Cached frozenset attribute for each array column, reset when the column is assigned
+_SET_CACHE_FOR = {"native_langs": "_native_set", "target_langs": "_target_set", "interests": "_interests_set"}
+
+# XP needed to reach level L is _LEVEL_THRESHOLDS[L - 1] (L^2 * 100)
+_MAX_TABULATED_LEVEL = 200
+_LEVEL_THRESHOLDS = [(level ** 2) * 100 for level in range(1, _MAX_TABULATED_LEVEL + 1)]
+
+# Lowest to highest
+_CEFR_ORDER = list(CEFRLevel)
+# Stored value -> level; unknown values map to None without raising
+_CEFR_BY_VALUE = {level.value: level for level in CEFRLevel}
+
+
 class User(Base):
     """User model for language learners"""
     __tablename__ = "users"
@@ -60,7 +96,7 @@ class User(Base):
     
     # Personal information
     display_name = Column(String(100), nullable=True)
-    bio = Column(Text, nullable=True)
+    bio = deferred(Column(Text, nullable=True), group="profile")
     timezone = Column(String(50), nullable=False, default="UTC")
     age_group = Column(SQLEnum(AgeGroup), nullable=False)
     
@@ -72,23 +108,31 @@ class User(Base):
     
     # Onboarding
     onboard_state = Column(SQLEnum(OnboardingState), default=OnboardingState.INCOMPLETE, nullable=False)
+    # Generated from onboard_state (stored by member name); fetched back on flush via eager_defaults
+    is_onboarded = Column(Boolean, Computed("onboard_state = 'COMPLETED'", persisted=True), nullable=False)
     
     # Language information (stored as JSON arrays and objects)
-    native_langs = Column(ARRAY(String(10)), nullable=False, default=[])  # ISO language codes
-    target_langs = Column(ARRAY(String(10)), nullable=False, default=[])  # ISO language codes
+    # Arrays are deferred (group "arrays"); queries that read them load FULL_PROFILE,
+    # while "has any" checks go through the cardinality column_properties below
+    native_langs = deferred(Column(ARRAY(String(10)), nullable=False, default=[]), group="arrays")  # ISO language codes
+    target_langs = deferred(Column(ARRAY(String(10)), nullable=False, default=[]), group="arrays")  # ISO language codes
+    has_native_langs = column_property(func.cardinality(native_langs.columns[0]) > 0)
+    has_target_langs = column_property(func.cardinality(target_langs.columns[0]) > 0)
     
     # Proficiency mapping: {"en": "NATIVE", "ja": "B1", "fr": "A2"}
-    proficiency_map = Column(JSON, nullable=False, default={})
+    # bio and the JSON profile fields are deferred (group "profile"); lists such as chat
+    # participants only need handle/display_name, full profiles load FULL_PROFILE
+    proficiency_map = deferred(Column(JSONB, nullable=False, default={}), group="profile")
     
     # Interests and preferences
-    interests = Column(ARRAY(String(50)), nullable=False, default=[])  # Topic tags
+    interests = deferred(Column(ARRAY(String(50)), nullable=False, default=[]), group="arrays")  # Topic tags
     
     # Learning goals and motivation
-    goals = Column(JSON, nullable=True)  # {"primary": "conversation", "target_fluency": "B2", "timeline": "6_months"}
+    goals = deferred(Column(JSONB, nullable=True), group="profile")  # {"primary": "conversation", "target_fluency": "B2", "timeline": "6_months"}
     
     # Availability windows (JSON array of time windows)
     # Format: [{"day": "monday", "start": "09:00", "end": "17:00", "timezone": "UTC"}]
-    availability_windows = Column(JSON, nullable=False, default=[])
+    availability_windows = deferred(Column(JSONB, nullable=False, default=[]), group="profile")
     
     # Profile customization
     avatar_url = Column(String(500), nullable=True)
@@ -123,65 +167,140 @@ class User(Base):
     
     # Indexes for performance
     __table_args__ = (
-        Index('ix_user_native_target_langs', 'native_langs', 'target_langs'),
-        Index('ix_user_age_group_active', 'age_group', 'is_active'),
-        Index('ix_user_onboard_state', 'onboard_state'),
-        Index('ix_user_created_at', 'created_at'),
-        Index('ix_user_last_login', 'last_login_at'),
+        # Interest overlap (candidate_query); btree cannot serve &&. Languages are
+        # matched through user_languages, so native/target arrays are not indexed
+        Index('ix_user_interests_gin', 'interests', postgresql_using='gin'),
+        # Proficiency containment (proficiency_at_least)
+        Index('ix_user_proficiency_gin', 'proficiency_map', postgresql_using='gin',
+              postgresql_ops={'proficiency_map': 'jsonb_path_ops'}),
+        # Status filters by age group answered from the index alone (id/handle via INCLUDE);
+        # languages are matched through user_languages, so the arrays stay out of it
+        Index('ix_user_matching_cover', 'age_group', 'is_active', 'onboard_state',
+              postgresql_include=['id', 'handle']),
+        # Matchable cohort (can_match), by age group
+        Index('ix_user_matchable', age_group,
+              postgresql_where=_matchable_predicate(is_active, is_banned, onboard_state)),
+        # created_at follows insertion order, so BRIN block ranges serve signup-date range scans
+        Index('ix_user_created_at_brin', 'created_at', postgresql_using='brin',
+              postgresql_with={'pages_per_range': 32}),
+        # Recent-login queries only; never-logged-in users stay out of the index
+        Index('ix_user_last_login', last_login_at, postgresql_where=last_login_at.isnot(None)),
     )
     
+    # Fetch server-generated values (is_onboarded, timestamps) with RETURNING on flush
+    __mapper_args__ = {"eager_defaults": True}
+    
     def __repr__(self):
         return f"<User(id={self.id}, handle={self.handle}, email={self.email})>"
     
-    @property
-    def is_onboarded(self) -> bool:
-        """Check if user has completed onboarding"""
-        return self.onboard_state == OnboardingState.COMPLETED
-    
-    @property
+    @hybrid_property
     def can_match(self) -> bool:
         """Check if user can be matched with others"""
         return (
             self.is_active and 
             not self.is_banned and 
-            self.is_onboarded and
-            len(self.native_langs) > 0 and 
-            len(self.target_langs) > 0
+            self.onboard_state == OnboardingState.COMPLETED and
+            self._nonempty("native_langs", "has_native_langs") and 
+            self._nonempty("target_langs", "has_target_langs")
+        )
+    
+    @can_match.expression
+    def can_match(cls):
+        # The first three terms match ix_user_matchable's predicate, so the planner can use it
+        return and_(
+            _matchable_predicate(cls.is_active, cls.is_banned, cls.onboard_state),
+            func.cardinality(cls.native_langs) > 0,
+            func.cardinality(cls.target_langs) > 0,
+        )
+    
+    def _nonempty(self, array_attr: str, flag_attr: str) -> bool:
+        # Prefer the array when loaded (it may have been assigned since the flag was read)
+        value = self.__dict__.get(array_attr)
+        if value is not None:
+            return len(value) > 0
+        return bool(getattr(self, flag_attr))
+    
+    @classmethod
+    async def get(cls, db: AsyncSession, user_id: uuid.UUID) -> Optional["User"]:
+        """Load a user with every deferred group, reusing the identity map when already loaded"""
+        return await db.get(cls, user_id, options=FULL_PROFILE)
+    
+    @classmethod
+    def candidate_query(cls, native_langs: List[str], target_langs: List[str],
+                        interests: Optional[List[str]] = None, limit: int = 50):
+        """Active users who speak one of target_langs and learn one of native_langs
+        
+        The language tests are EXISTS lookups on user_languages (index-only scans
+        on ix_ul_lang_kind); interests, when given, must overlap too.
+        """
+        stmt = select(cls).options(*FULL_PROFILE).where(
+            UserLanguage.has_any(cls.id, target_langs, LanguageKind.NATIVE),
+            UserLanguage.has_any(cls.id, native_langs, LanguageKind.TARGET),
+            cls.can_match,
         )
+        if interests:
+            stmt = stmt.where(cls.interests.overlap(interests))
+        return stmt.limit(limit)
+    
+    @classmethod
+    def proficiency_at_least(cls, language: str, level: CEFRLevel):
+        """SQL predicate: proficiency in language is level or higher
+        
+        One @> test per qualifying level, each served by the GIN index.
+        """
+        levels = _CEFR_ORDER[_CEFR_ORDER.index(level):]
+        return or_(*(cls.proficiency_map.contains({language: lvl.value}) for lvl in levels))
     
     def get_proficiency(self, language: str) -> Optional[CEFRLevel]:
         """Get proficiency level for a specific language"""
-        level_str = self.proficiency_map.get(language)
-        if level_str:
-            try:
-                return CEFRLevel(level_str)
-            except ValueError:
-                return None
-        return None
+        level_str = (self._deferred("proficiency_map") or {}).get(language)
+        return _CEFR_BY_VALUE.get(level_str) if level_str else None
     
     def set_proficiency(self, language: str, level: CEFRLevel):
         """Set proficiency level for a specific language"""
-        if self.proficiency_map is None:
-            self.proficiency_map = {}
-        self.proficiency_map[language] = level.value
+        # Reassign rather than mutate so the change is flushed
+        self.proficiency_map = {**(self._deferred("proficiency_map") or {}), language: level.value}
+    
+    def _deferred(self, key: str):
+        """A deferred column's value, raising instead of lazy-loading (MissingGreenlet under AsyncSession)"""
+        if key not in self.__dict__ and key in _unloaded_deferred(self):
+            raise ValueError(f"User.{key} is not loaded; query with FULL_PROFILE")
+        return getattr(self, key)
+    
+    @cached_property
+    def _native_set(self) -> FrozenSet[str]:
+        return frozenset(self._deferred("native_langs") or ())
+    
+    @cached_property
+    def _target_set(self) -> FrozenSet[str]:
+        return frozenset(self._deferred("target_langs") or ())
+    
+    @cached_property
+    def _interests_set(self) -> FrozenSet[str]:
+        return frozenset(self._deferred("interests") or ())
+    
+    @validates("native_langs", "target_langs", "interests")
+    def _reset_sets(self, key, value):
+        self.__dict__.pop(_SET_CACHE_FOR[key], None)
+        return value
     
     def is_native_speaker(self, language: str) -> bool:
         """Check if user is native speaker of given language"""
-        return language in (self.native_langs or [])
+        return language in self._native_set
     
     def is_learning(self, language: str) -> bool:
         """Check if user is learning given language"""
-        return language in (self.target_langs or [])
+        return language in self._target_set
     
-    def has_common_interests(self, other_interests: List[str]) -> bool:
-        """Check if user has any common interests with given list"""
-        if not self.interests or not other_interests:
-            return False
-        return bool(set(self.interests) & set(other_interests))
+    def has_common_interests(self, other_interests: Iterable[str]) -> bool:
+        """Check if user has any common interests with given list (pass a frozenset in loops)"""
+        return not self._interests_set.isdisjoint(other_interests)
     
     def get_xp_for_next_level(self) -> int:
         """Calculate XP needed for next level"""
         # Simple exponential formula: level^2 * 100
+        if self.current_level < _MAX_TABULATED_LEVEL:
+            return _LEVEL_THRESHOLDS[self.current_level]
         next_level = self.current_level + 1
         return (next_level ** 2) * 100
     
@@ -191,9 +310,11 @@ class User(Base):
         self.total_xp += points
         
         # Calculate new level
-        # Level = floor(sqrt(total_xp / 100))
-        import math
-        new_level = max(1, int(math.sqrt(self.total_xp / 100)))
+        # Level = floor(sqrt(total_xp / 100)), i.e. the number of thresholds reached
+        new_level = bisect.bisect_right(_LEVEL_THRESHOLDS, self.total_xp)
+        if new_level == _MAX_TABULATED_LEVEL:
+            new_level = math.isqrt(self.total_xp // 100)
+        new_level = max(1, new_level)
         self.current_level = new_level
         
         return new_level > old_level
@@ -209,51 +330,254 @@ class User(Base):
         self.total_sessions += 1
         self.total_session_minutes += duration_minutes
     
-    def to_dict(self, include_sensitive: bool = False) -> Dict:
-        """Convert user to dictionary"""
-        data = {
-            "id": str(self.id),
-            "handle": self.handle,
-            "display_name": self.display_name,
-            "bio": self.bio,
-            "timezone": self.timezone,
-            "age_group": self.age_group.value if self.age_group else None,
-            "native_langs": self.native_langs or [],
-            "target_langs": self.target_langs or [],
-            "proficiency_map": self.proficiency_map or {},
-            "interests": self.interests or [],
-            "goals": self.goals,
-            "avatar_url": self.avatar_url,
-            "theme_preference": self.theme_preference,
-            "language_interface": self.language_interface,
-            "profile_visibility": self.profile_visibility,
-            "total_sessions": self.total_sessions,
-            "total_session_minutes": self.total_session_minutes,
-            "current_streak_days": self.current_streak_days,
-            "longest_streak_days": self.longest_streak_days,
-            "total_xp": self.total_xp,
-            "current_level": self.current_level,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "last_login_at": self.last_login_at.isoformat() if self.last_login_at else None,
-            "is_onboarded": self.is_onboarded,
-            "can_match": self.can_match,
-        }
-        
+    @classmethod
+    def _json_fields(cls, include_sensitive: bool) -> List:
+        """(key, SQL expression) pairs mirroring to_dict, for select_as_json"""
+        fields = [
+            ("id", cls.id),
+            ("handle", cls.handle),
+            ("display_name", cls.display_name),
+            ("bio", cls.bio),
+            ("timezone", cls.timezone),
+            ("age_group", _enum_value_expr(cls.age_group, AgeGroup)),
+            ("native_langs", cls.native_langs),
+            ("target_langs", cls.target_langs),
+            ("proficiency_map", cls.proficiency_map),
+            ("interests", cls.interests),
+            ("goals", cls.goals),
+            ("avatar_url", cls.avatar_url),
+            ("theme_preference", cls.theme_preference),
+            ("language_interface", cls.language_interface),
+            ("profile_visibility", cls.profile_visibility),
+            ("total_sessions", cls.total_sessions),
+            ("total_session_minutes", cls.total_session_minutes),
+            ("current_streak_days", cls.current_streak_days),
+            ("longest_streak_days", cls.longest_streak_days),
+            ("total_xp", cls.total_xp),
+            ("current_level", cls.current_level),
+            ("created_at", cls.created_at),
+            ("last_login_at", cls.last_login_at),
+            ("is_onboarded", cls.is_onboarded),
+            ("can_match", cls.can_match),
+        ]
         if include_sensitive:
-            data.update({
-                "email": self.email,
-                "is_active": self.is_active,
-                "is_verified": self.is_verified,
-                "is_banned": self.is_banned,
-                "role": self.role.value if self.role else None,
-                "onboard_state": self.onboard_state.value if self.onboard_state else None,
-                "availability_windows": self.availability_windows or [],
-                "allow_minor_matching": self.allow_minor_matching,
-                "email_verified_at": self.email_verified_at.isoformat() if self.email_verified_at else None,
-                "updated_at": self.updated_at.isoformat() if self.updated_at else None,
-            })
+            fields += [
+                ("email", cls.email),
+                ("is_active", cls.is_active),
+                ("is_verified", cls.is_verified),
+                ("is_banned", cls.is_banned),
+                ("role", _enum_value_expr(cls.role, UserRole)),
+                ("onboard_state", _enum_value_expr(cls.onboard_state, OnboardingState)),
+                ("availability_windows", cls.availability_windows),
+                ("allow_minor_matching", cls.allow_minor_matching),
+                ("email_verified_at", cls.email_verified_at),
+                ("updated_at", cls.updated_at),
+            ]
+        return fields
+    
+    @classmethod
+    async def select_as_json(cls, db: AsyncSession, ids: List[uuid.UUID],
+                             include_sensitive: bool = False) -> bytes:
+        """JSON array of to_dict-shaped objects for ids, built entirely in Postgres
         
-        return data
+        Skips ORM loading; return the bytes directly, e.g.
+        Response(content=..., media_type="application/json").
+        """
+        # Keys are inlined: jsonb_build_object is VARIADIC "any", so bound keys would have no type
+        obj = func.jsonb_build_object(*(
+            arg for key, expr in cls._json_fields(include_sensitive)
+            for arg in (literal_column(f"'{key}'"), expr)
+        ))
+        stmt = select(
+            cast(func.coalesce(func.jsonb_agg(aggregate_order_by(obj, cls.created_at)),
+                               literal_column("'[]'::jsonb")), Text)
+        ).where(cls.id.in_(ids))
+        result = await db.execute(stmt)
+        return result.scalar_one().encode()
+    
+    def to_dict(self, include_sensitive: bool = False) -> Dict:
+        """Convert user to dictionary
+        
+        Deferred fields that were not loaded (e.g. on Session participants) are
+        left out rather than lazy-loaded; load with FULL_PROFILE to get them all.
+        """
+        fields = _ALL_FIELDS if include_sensitive else _PUBLIC_FIELDS
+        unloaded = _unloaded_deferred(self)
+        if unloaded:
+            return {key: getter(self) for key, getter in fields if key not in unloaded}
+        return {key: getter(self) for key, getter in fields}
+    
+    @classmethod
+    def bulk_to_dict(cls, users: Iterable["User"], include_sensitive: bool = False) -> List[Dict]:
+        """Serialize many users; field lookup is resolved once for the whole batch (see to_dict)"""
+        keys, getters = _ALL_COLUMNS if include_sensitive else _PUBLIC_COLUMNS
+        return [
+            user.to_dict(include_sensitive) if _unloaded_deferred(user)
+            else dict(zip(keys, [getter(user) for getter in getters]))
+            for user in users
+        ]
+
+
+# Loader options for callers that read deferred fields (to_dict, language/proficiency helpers)
+FULL_PROFILE = (undefer_group("arrays"), undefer_group("profile"))
+
+# Attribute keys of the deferred columns, which to_dict also uses as field keys
+_DEFERRED_FIELDS = frozenset({
+    "native_langs", "target_langs", "interests",
+    "bio", "proficiency_map", "goals", "availability_windows",
+})
+
+
+def _unloaded_deferred(user: User) -> FrozenSet[str]:
+    """Deferred fields not loaded on a persistent/detached user (transient ones have none)"""
+    state = inspect(user)
+    if not state.has_identity:
+        return frozenset()
+    return _DEFERRED_FIELDS & state.unloaded
+
+
+# Index-only scans skip the heap only for all-visible pages; vacuum users more often
+# than the 20% default so the visibility map stays current
+event.listen(User.__table__, "after_create", DDL(
+    "ALTER TABLE users SET (autovacuum_vacuum_scale_factor = 0.02, autovacuum_analyze_scale_factor = 0.01)"
+).execute_if(dialect="postgresql"))
+
+
+def _value_or_none(name: str):
+    get = attrgetter(name)
+    return lambda user: value.value if (value := get(user)) else None
+
+
+def _or_empty(name: str, empty):
+    get = attrgetter(name)
+    return lambda user: get(user) or empty()
+
+
+def _iso_or_none(name: str):
+    get = attrgetter(name)
+    return lambda user: value.isoformat() if (value := get(user)) else None
+
+
+# (key, getter) pairs rendered by User.to_dict, in output order. IDs and timestamps are
+# strings, as in every other model's to_dict, so the result is plain-JSON safe.
+_PUBLIC_FIELDS = (
+    ("id", lambda user: str(user.id)),
+    ("handle", attrgetter("handle")),
+    ("display_name", attrgetter("display_name")),
+    ("bio", attrgetter("bio")),
+    ("timezone", attrgetter("timezone")),
+    ("age_group", _value_or_none("age_group")),
+    ("native_langs", _or_empty("native_langs", list)),
+    ("target_langs", _or_empty("target_langs", list)),
+    ("proficiency_map", _or_empty("proficiency_map", dict)),
+    ("interests", _or_empty("interests", list)),
+    ("goals", attrgetter("goals")),
+    ("avatar_url", attrgetter("avatar_url")),
+    ("theme_preference", attrgetter("theme_preference")),
+    ("language_interface", attrgetter("language_interface")),
+    ("profile_visibility", attrgetter("profile_visibility")),
+    ("total_sessions", attrgetter("total_sessions")),
+    ("total_session_minutes", attrgetter("total_session_minutes")),
+    ("current_streak_days", attrgetter("current_streak_days")),
+    ("longest_streak_days", attrgetter("longest_streak_days")),
+    ("total_xp", attrgetter("total_xp")),
+    ("current_level", attrgetter("current_level")),
+    ("created_at", _iso_or_none("created_at")),
+    ("last_login_at", _iso_or_none("last_login_at")),
+    # From onboard_state, so it is right before the generated column is flushed/fetched
+    ("is_onboarded", lambda user: user.onboard_state == OnboardingState.COMPLETED),
+    ("can_match", attrgetter("can_match")),
+)
+
+_ALL_FIELDS = _PUBLIC_FIELDS + (
+    ("email", attrgetter("email")),
+    ("is_active", attrgetter("is_active")),
+    ("is_verified", attrgetter("is_verified")),
+    ("is_banned", attrgetter("is_banned")),
+    ("role", _value_or_none("role")),
+    ("onboard_state", _value_or_none("onboard_state")),
+    ("availability_windows", _or_empty("availability_windows", list)),
+    ("allow_minor_matching", attrgetter("allow_minor_matching")),
+    ("email_verified_at", _iso_or_none("email_verified_at")),
+    ("updated_at", _iso_or_none("updated_at")),
+)
+
+# The same tables split into (keys, getters) for User.bulk_to_dict
+_PUBLIC_COLUMNS = tuple(zip(*_PUBLIC_FIELDS))
+_ALL_COLUMNS = tuple(zip(*_ALL_FIELDS))
+
+
+class UserLanguage(Base):
+    """One row per (user, language, kind), mirroring User.native_langs/target_langs
+    
+    Serves language matching with plain btree lookups instead of array GIN scans.
+    The arrays stay the source of truth; rows are rewritten in the same flush
+    whenever they (or proficiency_map, for level) change, see _sync_user_languages.
+    """
+    __tablename__ = "user_languages"
+    
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    lang = Column(String(10), primary_key=True)  # ISO language code
+    kind = Column(SQLEnum(LanguageKind), primary_key=True)
+    level = Column(SQLEnum(CEFRLevel), nullable=True)  # From User.proficiency_map
+    
+    __table_args__ = (
+        # Covers "who speaks/learns lang" lookups, user_id included for index-only scans
+        Index('ix_ul_lang_kind', 'lang', 'kind', 'user_id'),
+    )
+    
+    def __repr__(self):
+        return f"<UserLanguage(user_id={self.user_id}, lang={self.lang}, kind={self.kind})>"
+    
+    @classmethod
+    def has_any(cls, user_id, langs: Iterable[str], kind: LanguageKind):
+        """SQL predicate: user_id has a row of kind for one of langs"""
+        return exists().where(cls.lang.in_(list(langs)), cls.kind == kind, cls.user_id == user_id)
+
+
+_ARRAY_FOR_KIND = {LanguageKind.NATIVE: "native_langs", LanguageKind.TARGET: "target_langs"}
+
+
+def _level_from_proficiency():
+    """SQL: the user's proficiency_map entry for user_languages.lang as a CEFR level, else NULL"""
+    level_text = User.proficiency_map[UserLanguage.lang].astext
+    return case(
+        (level_text.in_([level.name for level in CEFRLevel]), cast(level_text, UserLanguage.level.type)),
+        else_=None,
+    )
+
+
+def _sync_user_languages(mapper, connection, target: User):
+    """Rewrite user_languages rows for the arrays changed in this flush
+    
+    Only changed attributes are read (their new values are in the instance), so
+    deferred columns are never loaded here. Levels are taken from the users row
+    the flush just wrote, so proficiency_map need not be loaded either.
+    """
+    state = inspect(target)
+    changed = [kind for kind, attr in _ARRAY_FOR_KIND.items() if state.attrs[attr].history.has_changes()]
+    if not changed and not state.attrs.proficiency_map.history.has_changes():
+        return
+    
+    for kind in changed:
+        connection.execute(
+            delete(UserLanguage).where(UserLanguage.user_id == target.id, UserLanguage.kind == kind)
+        )
+        langs = dict.fromkeys(state.dict.get(_ARRAY_FOR_KIND[kind]) or ())
+        if langs:
+            connection.execute(insert(UserLanguage), [
+                {"user_id": target.id, "lang": lang, "kind": kind} for lang in langs
+            ])
+    
+    connection.execute(
+        update(UserLanguage)
+        .where(UserLanguage.user_id == target.id, User.id == UserLanguage.user_id)
+        .values(level=_level_from_proficiency())
+    )
+
+
+event.listen(User, "after_insert", _sync_user_languages)
+event.listen(User, "after_update", _sync_user_languages)
 
 
 class Device(Base):
@@ -0,0 +1,38 @@
+from sqlalchemy import SmallInteger
+from sqlalchemy.types import TypeDecorator
+import enum
+from typing import Optional, Type
+
+
+class IntEnumType(TypeDecorator):
+    """Store an IntEnum as a SMALLINT and load it back as the enum member"""
+    
+    impl = SmallInteger
+    cache_ok = True
+    
+    def __init__(self, enum_class: Type[enum.IntEnum], *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.enum_class = enum_class
+    
+    def process_bind_param(self, value, dialect) -> Optional[int]:
+        if value is None:
+            return None
+        return int(self.enum_class(value))
+    
+    def process_literal_param(self, value, dialect) -> str:
+        # Used when rendering DDL, e.g. partial index predicates
+        return str(int(self.enum_class(value)))
+    
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return self.enum_class(value)
+    
+    @property
+    def python_type(self):
+        return self.enum_class
+
+
+__all__ = [
+    "IntEnumType",
+]
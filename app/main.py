@@ -1,16 +1,28 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from contextlib import asynccontextmanager
-import redis
+import asyncio
+from sqlalchemy import text
 from loguru import logger
 
-from app.config import settings
-from app.db.base import engine, Base
+from app.config import settings, configure_logging
+from app.api.json import ORJSONResponse
+from app.db.base import get_engine, get_async_session_local, Base
+from app.db.cache import session_state_cache, run_flush_loop
+from app.db.analytics import run_daily_stats_refresh_loop
+from app.db.models.session import session_update_batcher
+# Register mappers used by Session relationships; aliased so user/match stay free for the API routers
+import app.db.models.user as _user_models  # noqa: F401
+import app.db.models.match as _match_models  # noqa: F401
 from app.core.rate_limiter import RateLimiterMiddleware
+from app.core.redis_client import get_redis, close_redis
+from app.utils.clock import RequestClockMiddleware
 # from app.api.v1 import auth, users, match, sessions, messages, vocab, streaks, challenges, feedback
 # from app.api.v1.websocket import chat_ws
 
+configure_logging()
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -18,18 +30,36 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("🚀 Starting Language Exchange Platform...")
     
-    # Create database tables
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # Create database tables in development only; other environments are migrated ahead of
+    # deploy (including the DDL hooked on create_all in app.db.analytics)
+    async def _init_db():
+        async with get_engine().begin() as conn:
+            if settings.is_development:
+                await conn.run_sync(Base.metadata.create_all)
+            else:
+                await conn.execute(text("SELECT 1 FROM users LIMIT 0"))
+    
+    # Shared async Redis pool; handlers use request.app.state.redis
+    async def _init_redis():
+        try:
+            app.state.redis = get_redis()
+            await app.state.redis.ping()
+            logger.info("✅ Redis connection established")
+        except Exception as e:
+            logger.error(f"❌ Redis connection failed: {e}")
+            raise
+    
+    # Independent round trips, so boot waits on the slower of the two
+    await asyncio.gather(_init_db(), _init_redis())
     
-    # Test Redis connection
-    try:
-        redis_client = redis.from_url(settings.REDIS_URL)
-        redis_client.ping()
-        logger.info("✅ Redis connection established")
-    except Exception as e:
-        logger.error(f"❌ Redis connection failed: {e}")
-        raise
+    # Periodically persist Redis-buffered session state
+    flush_task = asyncio.create_task(
+        run_flush_loop(session_state_cache, settings.SESSION_HOT_STATE_FLUSH_SECONDS)
+    )
+    batcher_task = asyncio.create_task(session_update_batcher.run(get_async_session_local()))
+    stats_task = asyncio.create_task(
+        run_daily_stats_refresh_loop(get_async_session_local(), settings.SESSION_DAILY_STATS_REFRESH_SECONDS)
+    )
     
     logger.info("✅ Application startup complete")
     
@@ -37,6 +67,15 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("🔄 Shutting down Language Exchange Platform...")
+    flush_task.cancel()
+    batcher_task.cancel()
+    stats_task.cancel()
+    await asyncio.gather(flush_task, batcher_task, stats_task, return_exceptions=True)
+    
+    # Write out whatever the batcher still holds
+    async with get_async_session_local()() as db:
+        await session_update_batcher.flush(db)
+    await close_redis()
     # Clean up resources if needed
     logger.info("✅ Application shutdown complete")
 
@@ -48,6 +87,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs" if settings.ENVIRONMENT == "development" else None,
     redoc_url="/redoc" if settings.ENVIRONMENT == "development" else None,
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -67,8 +107,12 @@ if settings.ENVIRONMENT == "production":
         allowed_hosts=settings.ALLOWED_HOSTS
     )
 
-# Add rate limiting middleware
-app.add_middleware(RateLimiterMiddleware)
+# Pin now_utc() once per request
+app.add_middleware(RequestClockMiddleware)
+
+# Add rate limiting middleware (skipped entirely in development unless DEBUG)
+if not (settings.is_development and not settings.DEBUG):
+    app.add_middleware(RateLimiterMiddleware)
 
 # Health check endpoint
 @app.get("/health")
@@ -106,13 +150,21 @@ app.include_router(feedback.router, prefix="/api/v1/feedback", tags=["Feedback"]
 app.include_router(chat_ws.router, prefix="/api/v1/ws", tags=["WebSocket"])
 
 # Global exception handler
+_INTERNAL_ERROR_BODY = {
+    "error": "Internal server error",
+    "message": "An unexpected error occurred"
+}
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
-    logger.error(f"Unhandled exception: {exc}")
-    return {
-        "error": "Internal server error",
-        "message": "An unexpected error occurred"
-    }
+    if settings.is_production:
+        # One static line per 5xx; no traceback walk on the hot error path
+        logger.error("Unhandled {} on {} {}: {}", type(exc).__name__, request.method, request.url.path, exc)
+    else:
+        logger.opt(exception=exc).error("Unhandled exception on {} {}", request.method, request.url.path)
+    return ORJSONResponse(status_code=500, content=_INTERNAL_ERROR_BODY)
+
 
 if __name__ == "__main__":
     import uvicorn
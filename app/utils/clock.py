@@ -0,0 +1,55 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# Request-scoped "now"; unset outside requests, where now_utc() reads the clock.
+# Always timezone-aware, to compare with the DateTime(timezone=True) columns.
+_request_now: ContextVar[Optional[datetime]] = ContextVar("request_now", default=None)
+
+
+def now_utc() -> datetime:
+    """Current aware UTC time, taken once per HTTP request when inside one"""
+    now = _request_now.get()
+    return now if now is not None else datetime.now(timezone.utc)
+
+
+@contextmanager
+def frozen_now(now: Optional[datetime] = None) -> Iterator[datetime]:
+    """Pin now_utc() for a block of work, e.g. one matcher or sweeper tick"""
+    now = now or datetime.now(timezone.utc)
+    token = _request_now.set(now)
+    try:
+        yield now
+    finally:
+        _request_now.reset(token)
+
+
+class RequestClockMiddleware:
+    """Pure ASGI middleware that pins now_utc() for the duration of each HTTP request
+    
+    WebSocket connections are long-lived, so they keep reading the live clock.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        token = _request_now.set(datetime.now(timezone.utc))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_now.reset(token)
+
+
+# Export commonly used items
+__all__ = [
+    "now_utc",
+    "frozen_now",
+    "RequestClockMiddleware",
+]
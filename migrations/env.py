@@ -0,0 +1,35 @@
+from logging.config import fileConfig
+from alembic import context
+
+from app.config import settings
+from app.db.base import Base, get_sync_engine
+import app.db.models.user  # noqa: F401  (register every table on Base.metadata)
+import app.db.models.match  # noqa: F401
+import app.db.models.session  # noqa: F401
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline():
+    """Emit SQL to stdout (alembic upgrade --sql)"""
+    context.configure(url=settings.DATABASE_URL, target_metadata=target_metadata, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """Run migrations against the database through the app's sync engine"""
+    with get_sync_engine().connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
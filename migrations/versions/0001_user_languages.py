@@ -0,0 +1,70 @@
+"""Create user_languages, backfill it from the language arrays, drop the array GIN indexes
+
+Every statement is idempotent, so it also applies cleanly to databases that
+create_all already built in development.
+
+Revision ID: 0001_user_languages
+Revises:
+Create Date: 2026-10-14
+"""
+from alembic import op
+
+revision = "0001_user_languages"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Enum labels are member names (SQLAlchemy Enum), matching CEFRLevel/LanguageKind
+_CEFR_LABELS = "'A1', 'A2', 'B1', 'B2', 'C1', 'C2', 'NATIVE'"
+
+
+def upgrade():
+    op.execute("""
+    DO $$ BEGIN
+        CREATE TYPE languagekind AS ENUM ('NATIVE', 'TARGET');
+    EXCEPTION WHEN duplicate_object THEN NULL;
+    END $$
+    """)
+    op.execute(f"""
+    DO $$ BEGIN
+        CREATE TYPE cefrlevel AS ENUM ({_CEFR_LABELS});
+    EXCEPTION WHEN duplicate_object THEN NULL;
+    END $$
+    """)
+    op.execute("""
+    CREATE TABLE IF NOT EXISTS user_languages (
+        user_id UUID NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+        lang VARCHAR(10) NOT NULL,
+        kind languagekind NOT NULL,
+        level cefrlevel,
+        CONSTRAINT pk_user_languages PRIMARY KEY (user_id, lang, kind)
+    )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_ul_lang_kind ON user_languages (lang, kind, user_id)")
+    
+    # One row per distinct language per array; level from proficiency_map when it is a CEFR label
+    op.execute(f"""
+    INSERT INTO user_languages (user_id, lang, kind, level)
+    SELECT langs.user_id, langs.lang, langs.kind,
+           CASE WHEN u.proficiency_map ->> langs.lang IN ({_CEFR_LABELS})
+                THEN (u.proficiency_map ->> langs.lang)::cefrlevel END
+    FROM (
+        SELECT id AS user_id, unnest(native_langs) AS lang, 'NATIVE'::languagekind AS kind FROM users
+        UNION
+        SELECT id, unnest(target_langs), 'TARGET'::languagekind FROM users
+    ) AS langs
+    JOIN users u ON u.id = langs.user_id
+    ON CONFLICT DO NOTHING
+    """)
+    
+    # Language matching no longer uses array overlap
+    op.execute("DROP INDEX IF EXISTS ix_user_native_langs_gin")
+    op.execute("DROP INDEX IF EXISTS ix_user_target_langs_gin")
+
+
+def downgrade():
+    op.execute("CREATE INDEX IF NOT EXISTS ix_user_native_langs_gin ON users USING gin (native_langs)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_user_target_langs_gin ON users USING gin (target_langs)")
+    op.execute("DROP TABLE IF EXISTS user_languages")
+    op.execute("DROP TYPE IF EXISTS languagekind")
+    op.execute("DROP TYPE IF EXISTS cefrlevel")
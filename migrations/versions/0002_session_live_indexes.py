@@ -0,0 +1,33 @@
+"""Backfill sessions.is_ended_flag and index live sessions per participant
+
+Replaces the full btree on the boolean with partial indexes that hold only
+sessions not yet ended.
+
+Revision ID: 0002_session_live_indexes
+Revises: 0001_user_languages
+Create Date: 2026-10-14
+"""
+from alembic import op
+
+revision = "0002_session_live_indexes"
+down_revision = "0001_user_languages"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE sessions ADD COLUMN IF NOT EXISTS is_ended_flag BOOLEAN NOT NULL DEFAULT false")
+    # Enum labels are SessionState member names
+    op.execute("""
+    UPDATE sessions SET is_ended_flag = true
+    WHERE state IN ('ENDED', 'DROPPED', 'EXPIRED') AND NOT is_ended_flag
+    """)
+    op.execute("DROP INDEX IF EXISTS ix_sessions_is_ended_flag")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_session_live_user1 ON sessions (user1_id) WHERE NOT is_ended_flag")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_session_live_user2 ON sessions (user2_id) WHERE NOT is_ended_flag")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_session_live_user2")
+    op.execute("DROP INDEX IF EXISTS ix_session_live_user1")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_sessions_is_ended_flag ON sessions (is_ended_flag)")
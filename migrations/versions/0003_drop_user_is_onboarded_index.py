@@ -0,0 +1,23 @@
+"""Drop ix_user_is_onboarded
+
+Its key was constant inside its own predicate; onboarded-cohort queries go
+through ix_user_matchable (keyed on age_group) instead.
+
+Revision ID: 0003_drop_user_is_onboarded_index
+Revises: 0002_session_live_indexes
+Create Date: 2026-10-14
+"""
+from alembic import op
+
+revision = "0003_drop_user_is_onboarded_index"
+down_revision = "0002_session_live_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("DROP INDEX IF EXISTS ix_user_is_onboarded")
+
+
+def downgrade():
+    op.execute("CREATE INDEX IF NOT EXISTS ix_user_is_onboarded ON users (is_onboarded) WHERE is_onboarded")
@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta, timezone
+
+from app.db.models import user, session  # noqa: F401  (registers mappers used by match relationships)
+from app.db.models.match import MatchCandidate
+from app.utils.clock import frozen_now
+
+
+def test_rejections_with_stored_aware_timestamps():
+    # Rows loaded from Postgres hold timestamptz values, i.e. aware datetimes
+    now = datetime.now(timezone.utc)
+    candidate = MatchCandidate(recent_rejections=[now - timedelta(days=2), now - timedelta(hours=1)])
+    
+    assert candidate.can_reject_more_today(max_rejections=2)
+    candidate.record_rejection()
+    
+    assert len(candidate.recent_rejections) == 2
+    assert all(t.tzinfo is not None for t in candidate.recent_rejections)
+    assert not candidate.can_reject_more_today(max_rejections=2)
+
+
+def test_rejections_inside_frozen_now():
+    # Matcher ticks pin now_utc(); loaded rows are still timestamptz values
+    with frozen_now() as now:
+        candidate = MatchCandidate(recent_rejections=[now - timedelta(hours=1)])
+        candidate.record_rejection()
+        
+        assert candidate.recent_rejections[-1] is now
+        assert candidate.can_reject_more_today(max_rejections=3)
@@ -0,0 +1,65 @@
+import fakeredis
+import pytest
+
+from app.core.rate_limiter import LocalBucketCache, RedisRateLimiter
+
+
+def _limiter() -> RedisRateLimiter:
+    limiter = RedisRateLimiter(fakeredis.FakeAsyncRedis())
+    # Keep every request after a sync on the local path
+    limiter._local_sync_interval_ns = 60 * 1_000_000_000
+    return limiter
+
+
+async def _redis_tokens(limiter: RedisRateLimiter, identifier: str, limit_type: str) -> int:
+    return int(await limiter.redis.hget(limiter._get_bucket_key(identifier, limit_type), "tokens"))
+
+
+@pytest.mark.asyncio
+async def test_unsynced_tokens_survive_expiry():
+    limiter = _limiter()
+    
+    # One sync (5 -> 4 in Redis), then two local-only consumptions
+    for _ in range(3):
+        allowed, _ = await limiter.is_allowed("ip:a", "report")
+        assert allowed
+    assert await _redis_tokens(limiter, "ip:a", "report") == 4
+    
+    # The local entry expires before ip:a is seen again
+    limiter._local.expire(time=float("inf"))
+    assert "rate_limit:v2:report:ip:a" in limiter._local.orphaned
+    
+    # Any later sync writes the dropped tokens back, in the background
+    await limiter.is_allowed("ip:b", "report")
+    await limiter._write_back
+    assert await _redis_tokens(limiter, "ip:a", "report") == 2
+    assert not limiter._local.orphaned
+
+
+@pytest.mark.asyncio
+async def test_unsynced_tokens_survive_eviction():
+    limiter = _limiter()
+    limiter._local = LocalBucketCache(maxsize=1, ttl=60)
+    
+    await limiter.is_allowed("ip:a", "report")
+    await limiter.is_allowed("ip:a", "report")
+    
+    # Caching ip:b evicts ip:a, whose local token is flushed right after
+    await limiter.is_allowed("ip:b", "report")
+    await limiter._write_back
+    assert await _redis_tokens(limiter, "ip:a", "report") == 3
+
+
+@pytest.mark.asyncio
+async def test_expired_entry_counts_go_to_its_own_next_sync():
+    limiter = _limiter()
+    
+    await limiter.is_allowed("ip:a", "report")
+    await limiter.is_allowed("ip:a", "report")
+    limiter._local.expire(time=float("inf"))
+    
+    # 5 - 1 synced - 1 orphaned - 1 requested
+    allowed, status = await limiter.is_allowed("ip:a", "report")
+    assert allowed
+    assert status["tokens_remaining"] == 2
+    assert await _redis_tokens(limiter, "ip:a", "report") == 2
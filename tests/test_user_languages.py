@@ -0,0 +1,44 @@
+import uuid
+
+from sqlalchemy.sql import Delete, Insert, Update
+
+from app.db.models import match, session  # noqa: F401  (registers mappers used by user relationships)
+from app.db.models.user import User, LanguageKind, _sync_user_languages
+
+
+class _RecordingConnection:
+    def __init__(self):
+        self.calls = []
+    
+    def execute(self, statement, parameters=None):
+        self.calls.append((statement, parameters))
+
+
+def _sync(user: User) -> list:
+    connection = _RecordingConnection()
+    _sync_user_languages(User.__mapper__, connection, user)
+    return connection.calls
+
+
+def test_changed_arrays_rewrite_their_kind():
+    user = User(id=uuid.uuid4(), native_langs=["en", "en"], target_langs=["ja"])
+    calls = _sync(user)
+    
+    inserts = [params for stmt, params in calls if isinstance(stmt, Insert)]
+    assert inserts == [
+        [{"user_id": user.id, "lang": "en", "kind": LanguageKind.NATIVE}],
+        [{"user_id": user.id, "lang": "ja", "kind": LanguageKind.TARGET}],
+    ]
+    assert sum(isinstance(stmt, Delete) for stmt, _ in calls) == 2
+    assert isinstance(calls[-1][0], Update)
+
+
+def test_proficiency_change_only_updates_levels():
+    user = User(id=uuid.uuid4(), proficiency_map={"ja": "B1"})
+    calls = _sync(user)
+    
+    assert [type(stmt) for stmt, _ in calls] == [Update]
+
+
+def test_unrelated_change_is_skipped():
+    assert _sync(User(id=uuid.uuid4(), display_name="x")) == []
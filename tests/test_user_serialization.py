@@ -0,0 +1,46 @@
+import uuid
+
+import pytest
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.db.models import match, session  # noqa: F401  (registers mappers used by user relationships)
+from app.db.models.user import User, AgeGroup, OnboardingState
+
+
+def _participant() -> User:
+    """A user as loaded without the deferred groups (e.g. Session.user1)"""
+    user = User(
+        id=uuid.uuid4(), handle="kai", display_name="Kai", age_group=AgeGroup.ADULT_26_35,
+        onboard_state=OnboardingState.COMPLETED, is_active=True, is_banned=False,
+        has_native_langs=True, has_target_langs=True,
+    )
+    # Every other non-deferred column as loaded from a row
+    for attr in User.__mapper__.column_attrs:
+        if not attr.deferred and attr.key not in user.__dict__:
+            setattr(user, attr.key, None)
+    make_transient_to_detached(user)
+    return user
+
+
+def test_to_dict_skips_unloaded_deferred_fields():
+    user = _participant()
+    data = user.to_dict()
+    
+    assert data["handle"] == "kai"
+    assert "bio" not in data and "native_langs" not in data and "proficiency_map" not in data
+    assert User.bulk_to_dict([user]) == [data]
+
+
+def test_to_dict_keeps_defaults_on_transient_users():
+    data = User(handle="kai").to_dict()
+    
+    assert data["native_langs"] == [] and data["proficiency_map"] == {}
+
+
+def test_helpers_raise_instead_of_lazy_loading():
+    user = _participant()
+    
+    with pytest.raises(ValueError, match="FULL_PROFILE"):
+        user.is_native_speaker("en")
+    with pytest.raises(ValueError, match="FULL_PROFILE"):
+        user.get_proficiency("en")